@@ -0,0 +1,16 @@
+"""Exceptions raised by the backend clients in streamlit_app.py.
+
+Streamlit re-executes the app script on every rerun, so a class defined there is
+a different class in each run. The clients cached with st.cache_resource would
+keep raising the one from their first run, and `except BackendError` in later
+runs would miss it. Classes imported from a module are created once per process.
+"""
+
+
+class BackendError(Exception):
+    """A failed backend call with its outcome class"""
+
+    def __init__(self, error_class: str, detail: str):
+        super().__init__(detail)
+        self.error_class = error_class
+        self.detail = detail
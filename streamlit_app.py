@@ -1,11 +1,59 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from datetime import datetime
-from typing import Dict, List
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import cProfile
+import hashlib
+import logging
+import logging.handlers
 import os
 import pytz
+import queue
+import random
+import socket
+import sqlite3
+import ssl
+import sys
+import tempfile
+import threading
 import time
+import uuid
+import zlib
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+import urllib3.util.connection as urllib3_connection
+
+# Imported rather than defined here so cached clients and later reruns share one class
+from backend_errors import BackendError
+
+# Streamlit's per-tab session id, used to correlate log lines
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = lambda: None  # noqa: E731
+
+# Optional: asyncio backend client for concurrent fan-out; the worker pool is used without it
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Optional: nicer per-rerun profiles when PROFILE_ENGINE=pyinstrument
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
 
 # Page configuration
 st.set_page_config(
@@ -19,29 +67,1077 @@ st.set_page_config(
 # Configuration
 def get_backend_url():
     """Get backend URL based on environment"""
-    # Check if running in Streamlit Cloud
-    if hasattr(st, 'secrets') and 'BACKEND_URL' in st.secrets:
-        return st.secrets['BACKEND_URL']
-    # Check environment variable
-    backend_url = os.getenv('BACKEND_URL')
+    # Check Streamlit Cloud secrets, then the environment
+    backend_url = get_config_value('BACKEND_URL')
     if backend_url:
         return backend_url
     # Production backend URL
     return "https://ai-calendar-assistant-grdx.onrender.com"
 
+def get_config_value(name: str, default=None):
+    """Get a config value from Streamlit secrets or the environment"""
+    try:
+        if hasattr(st, 'secrets') and name in st.secrets:
+            return st.secrets[name]
+    except FileNotFoundError:
+        pass
+    return os.getenv(name, default)
+
 BACKEND_URL = get_backend_url()
-SESSION_ID = "streamlit_session"
+
+# Per-browser backend conversations
+PERSIST_SESSION_ID = str(get_config_value('PERSIST_SESSION_ID', 'false')).lower() == 'true'  # keep the id in the URL
+SESSION_SHARDS = int(get_config_value('SESSION_SHARDS', 16))  # routing buckets exposed to the backend
+SESSION_ID_PARAM = "sid"
+
+# HTTP connection pool settings shared by every backend call
+HTTP_POOL_CONNECTIONS = int(get_config_value('HTTP_POOL_CONNECTIONS', 4))  # number of hosts kept pooled
+HTTP_POOL_MAXSIZE = int(get_config_value('HTTP_POOL_MAXSIZE', 20))  # sockets kept per host
+HTTP_POOL_BLOCK = str(get_config_value('HTTP_POOL_BLOCK', 'true')).lower() == 'true'  # wait instead of opening extra sockets
+HTTP_KEEP_ALIVE = str(get_config_value('HTTP_KEEP_ALIVE', 'true')).lower() == 'true'
+CONNECT_TIMEOUT = float(get_config_value('CONNECT_TIMEOUT', 5))  # seconds to open a connection
+
+# Retries with jittered exponential backoff, and the circuit breaker around them
+RETRY_MAX_ATTEMPTS = int(get_config_value('RETRY_MAX_ATTEMPTS', 3))  # attempts per call, including the first
+RETRY_BASE_DELAY = float(get_config_value('RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(get_config_value('RETRY_MAX_DELAY', 4))
+BREAKER_FAILURE_THRESHOLD = int(get_config_value('BREAKER_FAILURE_THRESHOLD', 3))  # consecutive outage failures
+BREAKER_RESET_TIMEOUT = float(get_config_value('BREAKER_RESET_TIMEOUT', 30))  # seconds before a trial request
+
+# Stream replies from /chat/stream when the backend supports it
+STREAMING_ENABLED = str(get_config_value('STREAMING_ENABLED', 'true')).lower() == 'true'
+
+# Cold-start readiness polling
+READINESS_POLL_SECONDS = float(get_config_value('READINESS_POLL_SECONDS', 2))  # UI refresh while waiting
+READINESS_INITIAL_BACKOFF = float(get_config_value('READINESS_INITIAL_BACKOFF', 1))
+READINESS_MAX_BACKOFF = float(get_config_value('READINESS_MAX_BACKOFF', 15))
+READINESS_TIMEOUT = float(get_config_value('READINESS_TIMEOUT', 180))  # give up after this many seconds
+QUEUED_RESEND_LIMIT = int(get_config_value('QUEUED_RESEND_LIMIT', 2))  # automatic re-sends of one queued message
+
+# Backend calls run on a shared worker pool instead of the script thread
+REQUEST_WORKERS = int(get_config_value('REQUEST_WORKERS', 16))  # threads shared by all sessions
+INFLIGHT_POLL_SECONDS = float(get_config_value('INFLIGHT_POLL_SECONDS', 0.5))  # UI refresh while a reply is pending
+ASYNC_CLIENT_ENABLED = str(get_config_value('ASYNC_CLIENT_ENABLED', 'true')).lower() == 'true'  # needs httpx
+
+# Structured free-slot lookups that skip the LLM when the backend offers GET /availability
+AVAILABILITY_ENABLED = str(get_config_value('AVAILABILITY_ENABLED', 'true')).lower() == 'true'
+AVAILABILITY_DEFAULT_DURATION = int(get_config_value('AVAILABILITY_DEFAULT_DURATION', 30))  # minutes
+AVAILABILITY_FANOUT_MAX_DAYS = 14  # longer ranges are asked for in one call
+AVAILABILITY_TIMEOUT = float(get_config_value('AVAILABILITY_TIMEOUT', 5))  # read timeout before falling back to /chat
+
+# Cached replies for read-only quick actions
+RESPONSE_CACHE_TTL = float(get_config_value('RESPONSE_CACHE_TTL', 60))  # seconds, 0 disables
+RESPONSE_CACHE_MAX_ENTRIES = int(get_config_value('RESPONSE_CACHE_MAX_ENTRIES', 1024))  # across all sessions
+
+# Shared /health results
+HEALTH_CACHE_TTL = float(get_config_value('HEALTH_CACHE_TTL', 15))  # served without re-probing
+HEALTH_CACHE_STALE_TTL = float(get_config_value('HEALTH_CACHE_STALE_TTL', 120))  # served while refreshing
+
+# Per-call timing spans shown in the sidebar diagnostics panel
+DIAGNOSTICS_WINDOW = int(get_config_value('DIAGNOSTICS_WINDOW', 500))  # recent spans kept per endpoint
+
+# OpenMetrics exporter for scraping the frontend process
+METRICS_PORT = int(get_config_value('METRICS_PORT', 0))  # side port serving /metrics, 0 disables
+METRICS_HOST = get_config_value('METRICS_HOST', '0.0.0.0')
+METRICS_SESSION_TTL = float(get_config_value('METRICS_SESSION_TTL', 300))  # seconds a session counts as active
+
+# Opt-in per-rerun profiling (also enabled per tab with ?profile=1)
+PROFILE_RERUNS = str(get_config_value('PROFILE_RERUNS', 'false')).lower() == 'true'
+PROFILE_DUMP_EVERY = int(get_config_value('PROFILE_DUMP_EVERY', 0))  # write a full profile every N runs, 0 disables
+PROFILE_DIR = get_config_value('PROFILE_DIR', os.path.join(tempfile.gettempdir(), "ai-calendar-assistant-profiles"))
+PROFILE_ENGINE = str(get_config_value('PROFILE_ENGINE', 'cprofile')).lower()  # cprofile or pyinstrument
+PROFILE_HISTORY = 50  # runs kept for the sidebar breakdown
+
+# Structured logging: JSON lines on stdout, written by a background thread
+LOG_LEVEL = str(get_config_value('LOG_LEVEL', 'INFO')).upper()
+LOG_SAMPLE_RATE = min(max(float(get_config_value('LOG_SAMPLE_RATE', 1)), 0.0), 1.0)  # share of sessions logging below WARNING
+
+# Backend pre-warming
+PREWARM_ENABLED = str(get_config_value('PREWARM_ENABLED', 'true')).lower() == 'true'  # probe when a session opens
+KEEPALIVE_INTERVAL = float(get_config_value('KEEPALIVE_INTERVAL', 0))  # seconds between pings, 0 disables
+
+# Bounded in-memory history; older messages spill to a per-session SQLite archive
+HISTORY_WINDOW = max(int(get_config_value('HISTORY_WINDOW', 200)), 50)  # messages kept in session state
+HISTORY_SPILL_BATCH = max(int(get_config_value('HISTORY_SPILL_BATCH', 50)), 1)  # overflow written to disk at once
+HISTORY_PAGE_SIZE = max(int(get_config_value('HISTORY_PAGE_SIZE', 50)), 1)  # archived messages per "load earlier"
+HISTORY_ARCHIVE_DIR = get_config_value('HISTORY_ARCHIVE_DIR', os.path.join(tempfile.gettempdir(), "ai-calendar-assistant-history"))
+HISTORY_ARCHIVE_MAX_AGE = float(get_config_value('HISTORY_ARCHIVE_MAX_AGE', 86400))  # seconds before an idle archive is deleted
+
+# st.fragment (Streamlit 1.37, experimental since 1.33) keeps polling out of full reruns; older
+# versions fall back to rerunning the whole page, which is slow on long histories
+_st_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+FRAGMENTS_AVAILABLE = _st_fragment is not None
+
+def fragment(run_every: Optional[float] = None):
+    """Decorate a function as an st.fragment when this Streamlit version supports it"""
+    def decorator(func):
+        if _st_fragment is None:
+            return func
+        return _st_fragment(run_every=run_every)(func)
+    return decorator
+
+def in_fragment_rerun() -> bool:
+    """Whether this run reruns only fragments, the one place st.rerun(scope="fragment") is allowed"""
+    return bool(getattr(get_script_run_ctx(), "fragment_ids_this_run", None))
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+LOG_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "session"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with `extra` fields at the top level"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "session": getattr(record, "session", None),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class SessionLogFilter(logging.Filter):
+    """Tag records with the session id and sample whole sessions below WARNING"""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "session", None) is None:
+            ctx = get_script_run_ctx()
+            record.session = ctx.session_id if ctx is not None else None
+        if record.levelno >= logging.WARNING or self.sample_rate >= 1:
+            return True
+        if record.session is None:
+            return random.random() < self.sample_rate
+        # Same decision for every record of a session, so sampled sessions log complete traces
+        return zlib.crc32(record.session.encode()) / 2 ** 32 < self.sample_rate
+
+logger = logging.getLogger("ai_calendar_assistant")
+
+@st.cache_resource
+def setup_logging() -> logging.handlers.QueueListener:
+    """Route app logs through a queue so callers never block on stdout"""
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SessionLogFilter(LOG_SAMPLE_RATE))
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(queue_handler)
+    logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    logger.propagate = False
+    return listener
+
+setup_logging()
+
+class RequestSpan:
+    """Timings and sizes of one backend HTTP attempt; phases stay None when they didn't happen"""
+    __slots__ = ("endpoint", "outcome", "dns", "connect", "tls", "ttfb", "total",
+                 "request_bytes", "response_bytes", "new_connection")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.outcome = None
+        self.dns = None
+        self.connect = None
+        self.tls = None
+        self.ttfb = None  # request sent to response headers, including any connection setup
+        self.total = None
+        self.request_bytes = None
+        self.response_bytes = None
+        self.new_connection = False
+
+# The span being filled in by the current thread's request
+_span_local = threading.local()
+
+def get_active_span() -> Optional[RequestSpan]:
+    return getattr(_span_local, "span", None)
+
+# urllib3's own create_connection, unwrapped so a rerun never wraps it twice
+_urllib3_create_connection = getattr(urllib3_connection.create_connection, "__wrapped__",
+                                     urllib3_connection.create_connection)
+
+def timed_create_connection(address, *args, **kwargs):
+    """urllib3's create_connection with its name lookup timed into the active span"""
+    span = get_active_span()
+    if span is None:
+        return _urllib3_create_connection(address, *args, **kwargs)
+    host, port = address
+    start = time.perf_counter()
+    try:
+        # The lookup urllib3 would make; it then connects to each result in turn as usual
+        addresses = socket.getaddrinfo(host.strip("[]"), port, urllib3_connection.allowed_gai_family(),
+                                       socket.SOCK_STREAM)
+    finally:
+        span.dns = time.perf_counter() - start
+    error = OSError("getaddrinfo returns an empty list")
+    for *_, sockaddr in addresses:
+        try:
+            return _urllib3_create_connection((sockaddr[0], port), *args, **kwargs)
+        except OSError as e:
+            error = e
+    raise error
+
+timed_create_connection.__wrapped__ = _urllib3_create_connection
+urllib3_connection.create_connection = timed_create_connection
+
+class TimedConnectionMixin:
+    """Time DNS and TCP connect separately when a pooled connection opens a socket"""
+
+    def _new_conn(self):
+        span = get_active_span()
+        if span is None:
+            return super()._new_conn()
+        span.new_connection = True
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            # DNS was timed by timed_create_connection inside urllib3's call
+            span.connect = time.perf_counter() - start - (span.dns or 0.0)
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        span = get_active_span()
+        start = time.perf_counter()
+        super().connect()
+        if span is not None and span.connect is not None:
+            span.tls = max(0.0, time.perf_counter() - start - (span.dns or 0.0) - span.connect)
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools use timed connections and which records TTFB and request size"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool
+        }
+
+    def send(self, request, *args, **kwargs):
+        span = get_active_span()
+        if span is None:
+            return super().send(request, *args, **kwargs)
+        body = request.body
+        span.request_bytes = len(body.encode() if isinstance(body, str) else body) if body else 0
+        start = time.perf_counter()
+        try:
+            return super().send(request, *args, **kwargs)
+        finally:
+            span.ttfb = time.perf_counter() - start
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+class SpanRecorder:
+    """Rolling window of recent spans per endpoint, plus script run times"""
+
+    def __init__(self, window: int):
+        self._lock = threading.Lock()
+        self._spans = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, span: RequestSpan):
+        with self._lock:
+            self._spans[span.endpoint].append(span)
+
+    def record_script_run(self, seconds: float):
+        """Time of one full script run, to tell frontend slowness from backend slowness"""
+        span = RequestSpan("script_run")
+        span.outcome = OUTCOME_OK
+        span.total = seconds
+        self.record(span)
+
+    def spans(self, endpoint: str) -> List[RequestSpan]:
+        with self._lock:
+            return list(self._spans.get(endpoint, ()))
+
+    def summary(self) -> List[Dict]:
+        """One row per endpoint with call counts, latency percentiles and phase means"""
+        with self._lock:
+            windows = {endpoint: list(spans) for endpoint, spans in self._spans.items()}
+        rows = []
+        for endpoint, spans in sorted(windows.items()):
+            def values(phase):
+                return [getattr(span, phase) for span in spans if getattr(span, phase) is not None]
+
+            def mean_ms(phase):
+                phase_values = values(phase)
+                return round(sum(phase_values) / len(phase_values) * 1000, 1) if phase_values else None
+
+            def p_ms(phase, fraction):
+                value = percentile(values(phase), fraction)
+                return round(value * 1000, 1) if value is not None else None
+
+            def mean_bytes(field):
+                field_values = values(field)
+                return int(sum(field_values) / len(field_values)) if field_values else None
+
+            rows.append({
+                "endpoint": endpoint,
+                "calls": len(spans),
+                "errors": sum(1 for span in spans if span.outcome not in (OUTCOME_OK, ERROR_CLIENT)),
+                "new_conns": sum(1 for span in spans if span.new_connection),
+                "p50_ms": p_ms("total", 0.5),
+                "p95_ms": p_ms("total", 0.95),
+                "ttfb_p50_ms": p_ms("ttfb", 0.5),
+                "dns_ms": mean_ms("dns"),
+                "connect_ms": mean_ms("connect"),
+                "tls_ms": mean_ms("tls"),
+                "req_bytes": mean_bytes("request_bytes"),
+                "resp_bytes": mean_bytes("response_bytes"),
+            })
+        return rows
+
+    def histogram(self, endpoint: str, phase: str = "total") -> List[Tuple[str, int]]:
+        """Counts of recent `phase` latencies per bucket"""
+        counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        for span in self.spans(endpoint):
+            value = getattr(span, phase)
+            if value is None:
+                continue
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+            counts[index] += 1
+        labels = [f"≤ {bound}s" for bound in LATENCY_BUCKETS] + [f"> {LATENCY_BUCKETS[-1]}s"]
+        return list(zip(labels, counts))
+
+@st.cache_resource
+def get_span_recorder() -> SpanRecorder:
+    """Process-wide timing spans of backend calls and script runs"""
+    return SpanRecorder(DIAGNOSTICS_WINDOW)
+
+# Exported metric families: name -> (type, help)
+METRIC_FAMILIES = {
+    "frontend_backend_request_duration_seconds": ("histogram", "Backend HTTP attempts by endpoint and outcome class"),
+    "frontend_backend_calls_dropped": ("counter", "Backend calls refused by the circuit breaker or cancelled by a newer message"),
+    "frontend_cold_start_detections": ("counter", "Backend failures treated as a cold start"),
+    "frontend_script_runs": ("counter", "Streamlit script runs across all sessions"),
+    "frontend_script_run_duration_seconds": ("histogram", "Wall time of one Streamlit script run"),
+    "frontend_active_sessions": ("gauge", "Browser sessions that ran the script recently"),
+    "frontend_session_reruns": ("gaugehistogram", "Script runs so far per active session"),
+    "frontend_session_history_messages": ("gaugehistogram", "Conversation length per active session, archived messages included"),
+    "frontend_response_cache_requests": ("counter", "Quick-action response cache lookups by result"),
+    "frontend_response_cache_entries": ("gauge", "Replies held in the response cache"),
+}
+
+SESSION_RERUN_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+SESSION_HISTORY_BUCKETS = (0, 10, 50, 100, 200, 500, 1000, 5000)
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+def format_histogram(name: str, labels: Tuple, buckets: Tuple, counts: List[int], total: float,
+                     count_suffix: str = "_count", sum_suffix: str = "_sum") -> List[str]:
+    """Cumulative bucket lines; `counts` has one extra slot for values above the last bound"""
+    lines, cumulative = [], 0
+    for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+        cumulative += bucket_count
+        lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+    lines.append(f"{name}{count_suffix}{format_labels(labels)} {cumulative}")
+    lines.append(f"{name}{sum_suffix}{format_labels(labels)} {total}")
+    return lines
+
+def bucket_index(value: float, buckets: Tuple) -> int:
+    return next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+
+class MetricsRegistry:
+    """Process-wide counters, histograms and per-session gauges rendered as OpenMetrics text"""
+
+    def __init__(self, session_ttl: float):
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts, sum]
+        self._sessions = {}  # session key -> (last_seen, reruns, history size)
+        self._sessions_pruned_at = time.time()
+        self._collectors = []  # callables returning {(name, labels): value} at scrape time
+
+    def inc(self, name: str, labels: Tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._counters[(name, labels)] += amount
+
+    def observe(self, name: str, value: float, labels: Tuple = ()):
+        with self._lock:
+            histogram = self._histograms.setdefault((name, labels), [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])
+            histogram[0][bucket_index(value, LATENCY_BUCKETS)] += 1
+            histogram[1] += value
+
+    def observe_session(self, session_key: str, history_size: int):
+        """Count a script run for a session and remember its conversation length"""
+        now = time.time()
+        with self._lock:
+            _, reruns, _ = self._sessions.get(session_key, (0.0, 0, 0))
+            self._sessions[session_key] = (now, reruns + 1, history_size)
+            # Closed tabs never say goodbye, so drop them here too rather than only when scraped
+            if now - self._sessions_pruned_at > self.session_ttl:
+                self._prune_sessions(now)
+
+    def _prune_sessions(self, now: float):
+        """Forget sessions idle longer than the TTL; the caller holds the lock"""
+        cutoff = now - self.session_ttl
+        for key in [key for key, (last_seen, _, _) in self._sessions.items() if last_seen < cutoff]:
+            del self._sessions[key]
+        self._sessions_pruned_at = now
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            self._prune_sessions(time.time())
+            counters = dict(self._counters)
+            histograms = {key: (list(counts), total) for key, (counts, total) in self._histograms.items()}
+            sessions = list(self._sessions.values())
+            collectors = list(self._collectors)
+        gauges = {("frontend_active_sessions", ()): len(sessions)}
+        for collector in collectors:
+            for (name, labels), value in collector().items():
+                if METRIC_FAMILIES[name][0] == "counter":
+                    counters[(name, labels)] = value
+                else:
+                    gauges[(name, labels)] = value
+
+        lines = []
+        for family, (kind, help_text) in METRIC_FAMILIES.items():
+            lines.append(f"# TYPE {family} {kind}")
+            lines.append(f"# HELP {family} {help_text}")
+            if family.endswith("_seconds"):
+                lines.append(f"# UNIT {family} seconds")
+            if kind == "counter":
+                for (name, labels), value in sorted(counters.items()):
+                    if name == family:
+                        lines.append(f"{family}_total{format_labels(labels)} {value}")
+            elif kind == "gauge":
+                for (name, labels), value in sorted(gauges.items()):
+                    if name == family:
+                        lines.append(f"{family}{format_labels(labels)} {value}")
+            elif kind == "histogram":
+                for (name, labels), (counts, total) in sorted(histograms.items()):
+                    if name == family:
+                        lines.extend(format_histogram(family, labels, LATENCY_BUCKETS, counts, total))
+            elif kind == "gaugehistogram":
+                field, buckets = {
+                    "frontend_session_reruns": (1, SESSION_RERUN_BUCKETS),
+                    "frontend_session_history_messages": (2, SESSION_HISTORY_BUCKETS),
+                }[family]
+                counts = [0] * (len(buckets) + 1)
+                for session in sessions:
+                    counts[bucket_index(session[field], buckets)] += 1
+                lines.extend(format_histogram(family, (), buckets, counts, sum(session[field] for session in sessions),
+                                              "_gcount", "_gsum"))
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource
+def get_metrics_registry() -> MetricsRegistry:
+    """Metrics shared by every session, exported when METRICS_PORT is set"""
+    return MetricsRegistry(METRICS_SESSION_TTL)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@st.cache_resource
+def start_metrics_exporter() -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on METRICS_PORT from a daemon thread, once per process"""
+    registry = get_metrics_registry()
+    # Resolve shared objects here: cache_resource must not be called from the server thread
+    response_cache = get_response_cache()
+
+    def collect_response_cache() -> Dict:
+        stats = response_cache.stats()
+        return {
+            ("frontend_response_cache_requests", (("result", "hit"),)): stats["hits"],
+            ("frontend_response_cache_requests", (("result", "miss"),)): stats["misses"],
+            ("frontend_response_cache_entries", ()): stats["entries"],
+        }
+
+    registry.add_collector(collect_response_cache)
+    handler = type("BoundMetricsHandler", (MetricsHandler,), {"registry": registry})
+    try:
+        server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), handler)
+    except OSError as e:
+        logger.warning("metrics exporter not started", extra={"host": METRICS_HOST, "port": METRICS_PORT, "error": str(e)})
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    logger.info("serving metrics", extra={"host": METRICS_HOST, "port": METRICS_PORT})
+    return server
+
+def record_script_run(seconds: float):
+    """Feed one finished script run into the diagnostics spans and the exported metrics"""
+    get_span_recorder().record_script_run(seconds)
+    registry = get_metrics_registry()
+    registry.inc("frontend_script_runs")
+    registry.observe("frontend_script_run_duration_seconds", seconds)
+    # Per-session gauges are only read by the exporter
+    if METRICS_PORT > 0 and "metrics_session_key" in st.session_state:
+        registry.observe_session(st.session_state.metrics_session_key, get_message_count())
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Process-wide pooled HTTP session so reruns and users reuse keep-alive connections"""
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=HTTP_POOL_BLOCK
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive" if HTTP_KEEP_ALIVE else "close"
+    return session
+
+# Backend outcome classes
+OUTCOME_OK = "ok"
+ERROR_CONNECT_TIMEOUT = "connect_timeout"
+ERROR_READ_TIMEOUT = "read_timeout"
+ERROR_DNS = "dns"
+ERROR_TLS = "tls"
+ERROR_CONNECTION = "connection"  # refused or reset
+ERROR_COLD_START = "cold_start"  # 503 from Render's proxy while the app boots
+ERROR_GATEWAY = "gateway_error"  # 502/504: the proxy may already have passed the request to the app
+ERROR_SERVER = "server_error"
+ERROR_CLIENT = "client_error"
+ERROR_REQUEST = "request_error"
+ERROR_CIRCUIT_OPEN = "circuit_open"  # not sent: the backend is known to be down
+ERROR_CANCELLED = "cancelled"  # superseded by a newer message before a reply was accepted
+
+class ErrorPolicy(NamedTuple):
+    startup: bool  # show the cold-start flow and queue the message
+    backoff: float  # minimum seconds before probing again
+    retries: int  # extra attempts allowed for this failure
+    idempotent_only: bool  # retry only requests that are safe to repeat (the backend may have acted)
+    trips_breaker: bool  # counts as the backend being down
+    message: str  # chat message for non-startup failures, formatted with {detail}
+
+ERROR_POLICIES = {
+    ERROR_CONNECT_TIMEOUT: ErrorPolicy(True, 1.0, 2, False, True, ""),
+    ERROR_COLD_START: ErrorPolicy(True, 2.0, 2, False, True, ""),
+    ERROR_GATEWAY: ErrorPolicy(False, 2.0, 2, True, True, "🚧 **The backend gateway returned an error** (502/504). Your request may still have been processed - please check your calendar before trying again."),
+    ERROR_CIRCUIT_OPEN: ErrorPolicy(True, 2.0, 0, False, False, ""),
+    ERROR_CANCELLED: ErrorPolicy(False, 0.0, 0, False, False, ""),
+    ERROR_READ_TIMEOUT: ErrorPolicy(False, 1.0, 1, True, False, "⏱️ **The assistant is taking longer than usual.** The service is up but didn't answer in time - please try again."),
+    ERROR_DNS: ErrorPolicy(False, 10.0, 1, False, True, "🌐 Couldn't resolve the backend address: {detail}. Please check the backend URL or your network."),
+    ERROR_TLS: ErrorPolicy(False, 10.0, 0, False, True, "🔒 Secure connection to the backend failed: {detail}"),
+    ERROR_CONNECTION: ErrorPolicy(False, 5.0, 1, True, True, "Connection error: {detail}. Please check if the backend is running."),
+    ERROR_SERVER: ErrorPolicy(False, 5.0, 1, True, False, "Error: {detail}"),
+    ERROR_CLIENT: ErrorPolicy(False, 0.0, 0, False, False, "Error: {detail}"),
+    ERROR_REQUEST: ErrorPolicy(False, 5.0, 0, False, False, "Request error: {detail}"),
+}
+
+def iter_exception_chain(error: BaseException) -> Iterator[BaseException]:
+    """Yield an exception and everything it wraps (args, urllib3 reasons, causes)"""
+    seen, stack = set(), [error]
+    while stack:
+        current = stack.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        stack.extend(arg for arg in current.args if isinstance(arg, BaseException))
+        stack.extend([getattr(current, "reason", None), current.__cause__, current.__context__])
+
+def classify_status_code(status_code: int) -> str:
+    """Outcome class for an HTTP response"""
+    if status_code == 503:
+        return ERROR_COLD_START
+    if status_code in (502, 504):
+        return ERROR_GATEWAY
+    if status_code >= 500:
+        return ERROR_SERVER
+    if status_code >= 400:
+        return ERROR_CLIENT
+    return OUTCOME_OK
+
+def classify_request_exception(error: requests.exceptions.RequestException) -> str:
+    """Outcome class for a failed request, by exception type rather than message text"""
+    # ConnectTimeout is also a ConnectionError, so check timeouts first
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return ERROR_CONNECT_TIMEOUT
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return ERROR_READ_TIMEOUT
+    if isinstance(error, requests.exceptions.SSLError):
+        return ERROR_TLS
+    if isinstance(error, requests.exceptions.ConnectionError):
+        causes = list(iter_exception_chain(error))
+        if any(isinstance(cause, socket.gaierror) or type(cause).__name__ == "NameResolutionError" for cause in causes):
+            return ERROR_DNS
+        # NewConnectionError subclasses ConnectTimeoutError but means refused or unreachable
+        if any(isinstance(cause, ConnectTimeoutError) and not isinstance(cause, NewConnectionError) for cause in causes):
+            return ERROR_CONNECT_TIMEOUT
+        if any(isinstance(cause, (ReadTimeoutError, socket.timeout)) for cause in causes):
+            return ERROR_READ_TIMEOUT
+        return ERROR_CONNECTION
+    if isinstance(error, requests.exceptions.Timeout):
+        return ERROR_READ_TIMEOUT
+    return ERROR_REQUEST
+
+def classify_httpx_exception(error: Exception) -> str:
+    """Outcome class for a failed httpx request, using the same classes as requests failures"""
+    # PoolTimeout is a TimeoutException too, but it means our own pool is saturated, not a cold start
+    if isinstance(error, httpx.PoolTimeout):
+        return ERROR_REQUEST
+    if isinstance(error, httpx.ConnectTimeout):
+        return ERROR_CONNECT_TIMEOUT
+    if isinstance(error, httpx.TimeoutException):
+        return ERROR_READ_TIMEOUT
+    if isinstance(error, httpx.ConnectError):
+        for cause in iter_exception_chain(error):
+            if isinstance(cause, socket.gaierror):
+                return ERROR_DNS
+            if isinstance(cause, ssl.SSLError):
+                return ERROR_TLS
+        return ERROR_CONNECTION
+    if isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError)):
+        return ERROR_CONNECTION
+    return ERROR_REQUEST
+
+class CircuitBreaker:
+    """Fails fast while the backend is known to be down; a health probe or timer half-opens it"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Whether a request may go out; while half-open only one trial request does"""
+        with self._lock:
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self._trial_in_flight = False
+
+    def release_trial(self):
+        """An inconclusive trial (e.g. a slow reply) lets another request try"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_probe_success(self):
+        """A healthy /health probe lets the next real request through as a trial"""
+        with self._lock:
+            if self.state == self.OPEN:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            elif self.state == self.CLOSED:
+                self.failures = 0
+
+def retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt`"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+class BackendClient:
+    """Sends backend requests over the pooled session with retries and a circuit breaker, recording every attempt"""
+
+    def __init__(self, http_session: requests.Session, spans: SpanRecorder, registry: MetricsRegistry):
+        self.http_session = http_session
+        self.spans = spans
+        self.registry = registry
+        self._breakers_lock = threading.Lock()
+        self._breakers = {}
+
+    def get_breaker(self, backend_url: str) -> CircuitBreaker:
+        with self._breakers_lock:
+            if backend_url not in self._breakers:
+                self._breakers[backend_url] = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+            return self._breakers[backend_url]
+
+    def record_attempt(self, span: RequestSpan):
+        """Feed one finished attempt into the diagnostics spans and the exported metrics"""
+        self.spans.record(span)
+        self.registry.observe("frontend_backend_request_duration_seconds", span.total,
+                              (("endpoint", span.endpoint), ("outcome", span.outcome)))
+
+    def record_dropped(self, endpoint: str, outcome: str):
+        """Count a call that was refused by the breaker or cancelled, so it has no timed attempt"""
+        self.registry.inc("frontend_backend_calls_dropped", (("endpoint", endpoint), ("outcome", outcome)))
+
+    def may_retry(self, breaker: CircuitBreaker, outcome: str, got_response: bool, attempt: int,
+                  max_attempts: int, idempotent: bool) -> bool:
+        """Update the breaker after a failed attempt and decide whether another attempt is allowed"""
+        policy = ERROR_POLICIES[outcome]
+        if policy.trips_breaker:
+            breaker.record_failure()
+        elif got_response:
+            breaker.record_success()
+        else:
+            breaker.release_trial()
+        return (
+            attempt <= policy.retries and attempt < max_attempts
+            and (idempotent or not policy.idempotent_only)
+            and breaker.state != CircuitBreaker.OPEN
+        )
+
+    def health_result(self, backend_url: str, response) -> Dict:
+        """Health dict for a /health response from requests or httpx"""
+        if response.status_code == 200:
+            try:
+                data = response.json()
+            except ValueError:
+                # e.g. a proxy's HTML page in front of an app that isn't serving yet
+                return {
+                    "status": "unhealthy",
+                    "error": "Status: 200 without a JSON body",
+                    "error_class": ERROR_SERVER
+                }
+            self.get_breaker(backend_url).record_probe_success()
+            return {"status": "healthy", "data": data}
+        return {
+            "status": "unhealthy",
+            "error": f"Status: {response.status_code}",
+            "error_class": classify_status_code(response.status_code)
+        }
+
+    def request(self, method: str, backend_url: str, path: str, endpoint: str,
+                idempotent: bool = False, max_attempts: int = RETRY_MAX_ATTEMPTS,
+                cancel: Optional[threading.Event] = None, **kwargs) -> requests.Response:
+        """Send a request, retrying safe failures; raises BackendError when no usable response arrives
+
+        Setting `cancel` stops the call before its next attempt, including during a backoff wait.
+        """
+        breaker = self.get_breaker(backend_url)
+        # /health is how the breaker learns the backend is back, so it is never blocked
+        if endpoint != "health" and not breaker.allow_request():
+            self.record_dropped(endpoint, ERROR_CIRCUIT_OPEN)
+            raise BackendError(ERROR_CIRCUIT_OPEN, "The backend is currently unavailable")
+
+        attempt = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                breaker.release_trial()
+                self.record_dropped(endpoint, ERROR_CANCELLED)
+                raise BackendError(ERROR_CANCELLED, "Superseded by a newer request")
+            attempt += 1
+            response, error = None, None
+            span = RequestSpan(endpoint)
+            _span_local.span = span
+            start = time.perf_counter()
+            try:
+                response = self.http_session.request(method, f"{backend_url}{path}", **kwargs)
+                outcome = classify_status_code(response.status_code)
+            except requests.exceptions.RequestException as e:
+                error = e
+                outcome = classify_request_exception(e)
+            finally:
+                _span_local.span = None
+            span.total = time.perf_counter() - start
+            span.outcome = outcome
+            if response is not None:
+                if kwargs.get("stream"):
+                    content_length = response.headers.get("Content-Length")
+                    span.response_bytes = int(content_length) if content_length and content_length.isdigit() else None
+                else:
+                    span.response_bytes = len(response.content)
+            self.record_attempt(span)
+
+            if outcome in (OUTCOME_OK, ERROR_CLIENT):
+                breaker.record_success()
+                return response
+
+            if not self.may_retry(breaker, outcome, response is not None, attempt, max_attempts, idempotent):
+                if response is not None:
+                    return response
+                raise BackendError(outcome, str(error)) from error
+
+            if response is not None:
+                response.close()
+            if cancel is not None:
+                cancel.wait(retry_delay(attempt))
+            else:
+                time.sleep(retry_delay(attempt))
+
+    def check_health(self, backend_url: str, max_attempts: int = RETRY_MAX_ATTEMPTS) -> Dict:
+        """Check if backend is healthy and ready"""
+        try:
+            response = self.request("GET", backend_url, "/health", "health", idempotent=True,
+                                    max_attempts=max_attempts, timeout=(CONNECT_TIMEOUT, 10))
+        except BackendError as e:
+            return {"status": "unhealthy", "error": e.detail, "error_class": e.error_class}
+        return self.health_result(backend_url, response)
+
+@st.cache_resource
+def get_backend_client() -> BackendClient:
+    """Backend client shared by every session and background worker"""
+    return BackendClient(get_http_session(), get_span_recorder(), get_metrics_registry())
+
+# The span and start time of the current asyncio task's request, read by the response hook
+_async_span = contextvars.ContextVar("async_span", default=None)
+
+def httpx_timeout(timeout) -> "httpx.Timeout":
+    """httpx timeout for a requests-style (connect, read) tuple or single number"""
+    if isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+    return httpx.Timeout(timeout)
+
+def trace_connection_phases(span: RequestSpan):
+    """httpx `trace` extension filling a span's connect and TLS times from httpcore's events
+
+    httpcore resolves the host inside connect_tcp, so `connect` includes DNS and `dns` stays empty.
+    """
+    started = {}
+
+    async def trace(event_name: str, info: Dict):
+        phase, _, state = event_name.rpartition(".")
+        if state == "started":
+            started[phase] = time.perf_counter()
+        elif state in ("complete", "failed") and phase in started:
+            elapsed = time.perf_counter() - started.pop(phase)
+            if phase == "connection.connect_tcp":
+                span.new_connection = True
+                span.connect = elapsed
+            elif phase == "connection.start_tls":
+                span.tls = elapsed
+    return trace
+
+class AsyncBackendClient:
+    """BackendClient's retries and breaker on one shared asyncio loop, for concurrent calls without a thread each
+
+    Breakers, metrics and spans are shared with the synchronous client.
+    Coroutines must run on this client's loop; other threads use submit().
+    """
+
+    def __init__(self, client: BackendClient):
+        self.client = client
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="backend-event-loop", daemon=True)
+        self.thread.start()
+        # httpx binds its connection pool to the loop it first runs on
+        self.http_client = self.submit(self.open_http_client()).result()
+
+    async def open_http_client(self) -> "httpx.AsyncClient":
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE if HTTP_KEEP_ALIVE else 0
+            ),
+            headers={"Connection": "keep-alive" if HTTP_KEEP_ALIVE else "close"},
+            event_hooks={"response": [self.on_response_headers]}
+        )
+
+    async def on_response_headers(self, response: "httpx.Response"):
+        active = _async_span.get()
+        if active is not None:
+            span, start = active
+            span.ttfb = time.perf_counter() - start
+
+    def submit(self, coroutine) -> Future:
+        """Schedule a coroutine from any thread; cancelling the future cancels the task"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    async def request(self, method: str, backend_url: str, path: str, endpoint: str,
+                      idempotent: bool = False, max_attempts: int = RETRY_MAX_ATTEMPTS,
+                      cancel: Optional[threading.Event] = None, **kwargs) -> "httpx.Response":
+        """Async BackendClient.request; raises BackendError when no usable response arrives"""
+        breaker = self.client.get_breaker(backend_url)
+        if endpoint != "health" and not breaker.allow_request():
+            self.client.record_dropped(endpoint, ERROR_CIRCUIT_OPEN)
+            raise BackendError(ERROR_CIRCUIT_OPEN, "The backend is currently unavailable")
+        if "timeout" in kwargs:
+            kwargs["timeout"] = httpx_timeout(kwargs["timeout"])
+
+        attempt = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                breaker.release_trial()
+                self.client.record_dropped(endpoint, ERROR_CANCELLED)
+                raise BackendError(ERROR_CANCELLED, "Superseded by a newer request")
+            attempt += 1
+            response, error = None, None
+            span = RequestSpan(endpoint)
+            start = time.perf_counter()
+            token = _async_span.set((span, start))
+            try:
+                response = await self.http_client.request(method, f"{backend_url}{path}",
+                                                          extensions={"trace": trace_connection_phases(span)}, **kwargs)
+                outcome = classify_status_code(response.status_code)
+            except httpx.HTTPError as e:
+                error = e
+                outcome = classify_httpx_exception(e)
+            except asyncio.CancelledError:
+                # The task was cancelled by a newer message; don't leave a half-open trial behind
+                breaker.release_trial()
+                self.client.record_dropped(endpoint, ERROR_CANCELLED)
+                raise
+            finally:
+                _async_span.reset(token)
+            span.total = time.perf_counter() - start
+            span.outcome = outcome
+            if response is not None:
+                span.request_bytes = len(response.request.content)
+                span.response_bytes = len(response.content)
+            self.client.record_attempt(span)
+
+            if outcome in (OUTCOME_OK, ERROR_CLIENT):
+                breaker.record_success()
+                return response
+
+            if not self.client.may_retry(breaker, outcome, response is not None, attempt, max_attempts, idempotent):
+                if response is not None:
+                    return response
+                raise BackendError(outcome, str(error)) from error
+            await asyncio.sleep(retry_delay(attempt))
+
+    async def check_health(self, backend_url: str, max_attempts: int = RETRY_MAX_ATTEMPTS) -> Dict:
+        """Async BackendClient.check_health"""
+        try:
+            response = await self.request("GET", backend_url, "/health", "health", idempotent=True,
+                                          max_attempts=max_attempts, timeout=(CONNECT_TIMEOUT, 10))
+        except BackendError as e:
+            return {"status": "unhealthy", "error": e.detail, "error_class": e.error_class}
+        return self.client.health_result(backend_url, response)
+
+@st.cache_resource
+def get_async_backend_client() -> Optional[AsyncBackendClient]:
+    """Event loop and async client shared by every session; None without httpx"""
+    if httpx is None or not ASYNC_CLIENT_ENABLED:
+        return None
+    return AsyncBackendClient(get_backend_client())
+
+def get_query_param(name: str) -> Optional[str]:
+    """Read a URL query parameter on old and new Streamlit versions"""
+    if hasattr(st, "query_params"):
+        return st.query_params.get(name)
+    values = st.experimental_get_query_params().get(name)
+    return values[0] if values else None
+
+def set_query_param(name: str, value: str):
+    """Set a URL query parameter on old and new Streamlit versions"""
+    if hasattr(st, "query_params"):
+        st.query_params[name] = value
+    else:
+        params = st.experimental_get_query_params()
+        params[name] = value
+        st.experimental_set_query_params(**params)
+
+def new_session_id() -> str:
+    """Create a backend conversation id, remembering it in the URL if configured"""
+    session_id = uuid.uuid4().hex
+    if PERSIST_SESSION_ID:
+        set_query_param(SESSION_ID_PARAM, session_id)
+    return session_id
+
+def load_session_id() -> str:
+    """Session id from the URL when persistence is on and it looks valid, else a new one"""
+    if PERSIST_SESSION_ID:
+        session_id = get_query_param(SESSION_ID_PARAM)
+        if session_id and len(session_id) == 32 and all(c in "0123456789abcdef" for c in session_id):
+            return session_id
+    return new_session_id()
+
+def get_shard_key(session_id: str) -> str:
+    """Stable routing bucket for a session, the same in every process"""
+    digest = hashlib.sha1(session_id.encode()).hexdigest()
+    return str(int(digest[:8], 16) % SESSION_SHARDS)
+
+def get_session_params(session_id: Optional[str] = None) -> Dict:
+    """Query parameters that tie a backend request to this browser's conversation"""
+    return {"session_id": session_id or st.session_state.session_id}
+
+def get_session_headers(session_id: Optional[str] = None) -> Dict:
+    """Headers a proxy or the backend can route on to keep a session on one shard"""
+    return {"X-Session-Shard": get_shard_key(session_id or st.session_state.session_id)}
 
 def init_session_state():
     """Initialize session state variables"""
+    is_new_session = "messages" not in st.session_state
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    elif st.session_state.messages and isinstance(st.session_state.messages[-1], dict):
+        # Histories injected as plain dicts (e.g. by the benchmarks)
+        st.session_state.messages = [
+            ChatMessage.from_dict(message) if isinstance(message, dict) else message
+            for message in st.session_state.messages
+        ]
+    # Messages before the in-memory window live in the session's archive
+    if "archived_message_count" not in st.session_state:
+        st.session_state.archived_message_count = 0
+    if "earlier_messages" not in st.session_state:
+        st.session_state.earlier_messages = []
+    # Stable per-tab key for session metrics; session_id changes when the conversation is cleared
+    if "metrics_session_key" not in st.session_state:
+        st.session_state.metrics_session_key = uuid.uuid4().hex
+    # Each browser session gets its own backend conversation
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = load_session_id()
     if "backend_url" not in st.session_state:
         st.session_state.backend_url = BACKEND_URL
     if "last_booking_message_index" not in st.session_state:
         st.session_state.last_booking_message_index = -1
     if "last_suggestion_message_index" not in st.session_state:
         st.session_state.last_suggestion_message_index = -1
+    # Incrementally maintained so display decisions don't rescan the history
+    if "last_actionable_message_index" not in st.session_state:
+        rebuild_message_indices()
     if "button_clicked" not in st.session_state:
         st.session_state.button_clicked = False
     # Track which booking has shown balloons to prevent repetition
@@ -52,76 +1148,713 @@ def init_session_state():
         st.session_state.pending_time_selection = None
     if "confirmation_pending" not in st.session_state:
         st.session_state.confirmation_pending = None
+    # Message waiting to be re-sent once the backend finishes starting up
+    if "queued_message" not in st.session_state:
+        st.session_state.queued_message = None
+    if "queued_idempotency_key" not in st.session_state:
+        st.session_state.queued_idempotency_key = None
+    if "queued_action_index" not in st.session_state:
+        st.session_state.queued_action_index = None
+    if "queued_resends" not in st.session_state:
+        st.session_state.queued_resends = 0
+    # Messages whose slot or confirmation buttons were already used
+    if "actioned_message_indices" not in st.session_state:
+        st.session_state.actioned_message_indices = set()
+    if "pending_quick_action" not in st.session_state:
+        st.session_state.pending_quick_action = None
+    if "pending_availability_query" not in st.session_state:
+        st.session_state.pending_availability_query = None
+    # Background /chat request whose reply hasn't been appended yet
+    if "inflight" not in st.session_state:
+        st.session_state.inflight = None
+    # Bumped by every new request so replies to superseded ones are dropped
+    if "request_generation" not in st.session_state:
+        st.session_state.request_generation = 0
+    # Bumped by every booking so cached availability replies go stale
+    if "calendar_version" not in st.session_state:
+        st.session_state.calendar_version = 0
+    # First message index rendered by the live tail fragment
+    if "render_tail_start" not in st.session_state:
+        st.session_state.render_tail_start = 0
+
+    # Wake the backend while the user is still reading the page
+    if is_new_session and PREWARM_ENABLED:
+        prewarm_backend(st.session_state.backend_url)
+
+# Interned so role checks compare identical string objects
+ROLE_USER = sys.intern("user")
+ROLE_ASSISTANT = sys.intern("assistant")
+IST = pytz.timezone('Asia/Kolkata')
+
+def to_epoch(timestamp) -> int:
+    """Epoch seconds from an epoch number, an ISO string or a datetime (naive means IST)"""
+    if timestamp is None:
+        return 0
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if timestamp.tzinfo is None:
+        timestamp = IST.localize(timestamp)
+    return int(timestamp.timestamp())
+
+class ChatMessage:
+    """One chat message; slots and sparse optional fields keep long histories small"""
+    __slots__ = ("role", "content", "timestamp", "flags", "booking_data", "suggested_times")
+
+    # Bits of `flags`
+    TIME_SELECTION = 1
+    CONFIRMATION = 2
+    REQUIRES_CONFIRMATION = 4
+    STARTUP_ERROR = 8
+    STRUCTURED_SLOTS = 16  # slots came from /availability rather than the LLM
+
+    def __init__(self, role: str, content: str, timestamp: Optional[int] = None, flags: int = 0,
+                 booking_data: Optional[Dict] = None, suggested_times: Optional[Iterable[str]] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.timestamp = int(time.time()) if timestamp is None else timestamp  # epoch seconds, 0 if unknown
+        self.flags = flags
+        # Most messages have neither, so store None rather than empty containers
+        self.booking_data = booking_data or None
+        self.suggested_times = tuple(suggested_times) if suggested_times else None
+
+    @property
+    def is_time_selection(self) -> bool:
+        return bool(self.flags & ChatMessage.TIME_SELECTION)
+
+    @property
+    def is_confirmation(self) -> bool:
+        return bool(self.flags & ChatMessage.CONFIRMATION)
+
+    @property
+    def requires_confirmation(self) -> bool:
+        return bool(self.flags & ChatMessage.REQUIRES_CONFIRMATION)
+
+    @property
+    def is_startup_error(self) -> bool:
+        return bool(self.flags & ChatMessage.STARTUP_ERROR)
+
+    @property
+    def has_structured_slots(self) -> bool:
+        return bool(self.flags & ChatMessage.STRUCTURED_SLOTS)
+
+    @property
+    def booking_id(self) -> str:
+        return self.booking_data.get("id") or "" if self.booking_data else ""
+
+    @classmethod
+    def from_response(cls, response: Dict) -> "ChatMessage":
+        """Assistant message for a backend reply"""
+        flags = 0
+        if response.get("requires_confirmation"):
+            flags |= cls.REQUIRES_CONFIRMATION
+        if response.get("is_startup_error"):
+            flags |= cls.STARTUP_ERROR
+        return cls(ROLE_ASSISTANT, response["message"], flags=flags,
+                   booking_data=response.get("booking_data"), suggested_times=response.get("suggested_times"))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ChatMessage":
+        """Rebuild a message from to_dict() output or the older free-form dicts"""
+        flags = data.get("flags", 0)
+        for key, bit in (("is_time_selection", cls.TIME_SELECTION), ("is_confirmation", cls.CONFIRMATION),
+                         ("requires_confirmation", cls.REQUIRES_CONFIRMATION), ("is_startup_error", cls.STARTUP_ERROR)):
+            if data.get(key):
+                flags |= bit
+        return cls(data["role"], data.get("content", ""), to_epoch(data.get("timestamp")), flags,
+                   data.get("booking_data"), data.get("suggested_times"))
+
+    def to_dict(self) -> Dict:
+        data = {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+        if self.flags:
+            data["flags"] = self.flags
+        if self.booking_data:
+            data["booking_data"] = self.booking_data
+        if self.suggested_times:
+            data["suggested_times"] = list(self.suggested_times)
+        return data
+
+def is_actionable_message(message: ChatMessage) -> bool:
+    """Assistant message that may show time slots, a confirmation or a booking"""
+    return message.role == ROLE_ASSISTANT and bool(
+        message.suggested_times or
+        message.booking_data or
+        message.requires_confirmation
+    )
+
+def is_decision_message(message: ChatMessage) -> bool:
+    """Assistant message that asks for or completes a booking"""
+    return message.role == ROLE_ASSISTANT and bool(
+        message.booking_data or
+        message.requires_confirmation
+    )
+
+def update_message_indices(message_index: int, message: ChatMessage):
+    """Record a newly appended message in the latest-message indices"""
+    if message.role == ROLE_USER:
+        st.session_state.user_message_count += 1
+        return
+    if is_actionable_message(message):
+        st.session_state.last_actionable_message_index = message_index
+    if is_decision_message(message):
+        st.session_state.last_decision_message_index = message_index
+    if message.booking_id:
+        st.session_state.last_booking_message_index = message_index
+    if message.suggested_times:
+        st.session_state.last_suggestion_message_index = message_index
+
+def rebuild_message_indices():
+    """Recompute the latest-message indices with a single pass over the history"""
+    st.session_state.last_actionable_message_index = -1
+    st.session_state.last_decision_message_index = -1
+    st.session_state.user_message_count = 0
+    for message_index, message in enumerate(st.session_state.messages, st.session_state.archived_message_count):
+        update_message_indices(message_index, message)
+
+def get_message_count() -> int:
+    """Length of the whole conversation, archived messages included"""
+    return st.session_state.archived_message_count + len(st.session_state.messages)
+
+def get_message(message_index: int) -> ChatMessage:
+    """Message at a conversation index that is still inside the in-memory window"""
+    return st.session_state.messages[message_index - st.session_state.archived_message_count]
+
+def append_message(message: ChatMessage) -> int:
+    """Append a message to the history and keep the indices current"""
+    st.session_state.messages.append(message)
+    message_index = get_message_count() - 1
+    update_message_indices(message_index, message)
+    spill_history()
+    return message_index
+
+def encode_message(message: ChatMessage) -> str:
+    """Serialize a message for the archive"""
+    return json.dumps(message.to_dict(), default=str)
+
+class MessageArchive:
+    """Append-only SQLite file holding the messages that left a session's window"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self) -> sqlite3.Connection:
+        if not os.path.exists(self.path):
+            # Create the file owner-only before SQLite opens it; its journal files take the same mode
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute("CREATE TABLE IF NOT EXISTS messages (message_index INTEGER PRIMARY KEY, body TEXT NOT NULL)")
+        return connection
+
+    def append(self, first_index: int, messages: List[ChatMessage]):
+        connection = self.connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO messages (message_index, body) VALUES (?, ?)",
+                    [(first_index + offset, encode_message(message)) for offset, message in enumerate(messages)]
+                )
+        finally:
+            connection.close()
+
+    def load(self, end_index: int, limit: int) -> List[ChatMessage]:
+        """Up to `limit` archived messages before `end_index`, oldest first"""
+        if not os.path.exists(self.path):
+            return []
+        connection = self.connect()
+        try:
+            rows = connection.execute(
+                "SELECT body FROM messages WHERE message_index < ? ORDER BY message_index DESC LIMIT ?",
+                (end_index, limit)
+            ).fetchall()
+        finally:
+            connection.close()
+        return [ChatMessage.from_dict(json.loads(body)) for (body,) in reversed(rows)]
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+@st.cache_resource(ttl=3600)
+def get_history_archive_dir() -> str:
+    """Create the archive directory and, hourly, drop archives of abandoned sessions"""
+    # Histories include calendar details, so only this user may read them, even under a shared temp dir
+    os.makedirs(HISTORY_ARCHIVE_DIR, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid") and os.stat(HISTORY_ARCHIVE_DIR).st_uid != os.getuid():
+        raise PermissionError(f"{HISTORY_ARCHIVE_DIR} belongs to another user")
+    os.chmod(HISTORY_ARCHIVE_DIR, 0o700)
+    cutoff = time.time() - HISTORY_ARCHIVE_MAX_AGE
+    for name in os.listdir(HISTORY_ARCHIVE_DIR):
+        path = os.path.join(HISTORY_ARCHIVE_DIR, name)
+        try:
+            if name.endswith(".sqlite3") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+    return HISTORY_ARCHIVE_DIR
+
+def get_message_archive() -> MessageArchive:
+    """Archive file for this browser session's conversation"""
+    return MessageArchive(os.path.join(get_history_archive_dir(), f"{st.session_state.session_id}.sqlite3"))
+
+def spill_history():
+    """Move the oldest messages to the archive once the window overflows by a batch"""
+    overflow = len(st.session_state.messages) - HISTORY_WINDOW
+    if overflow < HISTORY_SPILL_BATCH:
+        return
+    try:
+        get_message_archive().append(st.session_state.archived_message_count, st.session_state.messages[:overflow])
+    except (OSError, sqlite3.Error) as e:
+        # Keep everything in memory rather than lose messages
+        logger.warning("could not archive chat history", extra={"error": str(e)})
+        return
+    del st.session_state.messages[:overflow]
+    st.session_state.archived_message_count += overflow
+    # Loaded pages would no longer join up with the window
+    st.session_state.earlier_messages = []
+
+def load_earlier_messages():
+    """Callback: page the previous batch of archived messages back in, read-only"""
+    loaded = st.session_state.earlier_messages
+    end_index = st.session_state.archived_message_count - len(loaded)
+    try:
+        st.session_state.earlier_messages = get_message_archive().load(end_index, HISTORY_PAGE_SIZE) + loaded
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("could not load archived chat history", extra={"error": str(e)})
+
+def hide_earlier_messages():
+    """Callback: release the archived messages loaded into memory"""
+    st.session_state.earlier_messages = []
 
 def get_ist_time() -> datetime:
     """Get current time in IST"""
-    ist_tz = pytz.timezone('Asia/Kolkata')
     utc_now = datetime.utcnow()
-    return utc_now.replace(tzinfo=pytz.UTC).astimezone(ist_tz).replace(tzinfo=None)
+    return utc_now.replace(tzinfo=pytz.UTC).astimezone(IST).replace(tzinfo=None)
 
-def send_message_to_backend(message: str) -> Dict:
-    """Send message to FastAPI backend with enhanced startup handling"""
-    try:
-        # FIXED: Use IST timestamp
-        ist_time = get_ist_time()
-        payload = {
-            "role": "user",
-            "content": message,
-            "timestamp": ist_time.isoformat()
-        }
+def build_chat_payload(message: str) -> Dict:
+    """Build the /chat request body for a user message"""
+    # FIXED: Use IST timestamp
+    ist_time = get_ist_time()
+    return {
+        "role": "user",
+        "content": message,
+        "timestamp": ist_time.isoformat()
+    }
 
-        response = requests.post(
-            f"{st.session_state.backend_url}/chat",
-            json=payload,
-            params={"session_id": SESSION_ID},
-            timeout=35  # Slightly increased timeout
+def action_idempotency_key(message_index: int, action: str) -> str:
+    """Same key for every submission of one button action, so the backend can drop repeats"""
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{st.session_state.session_id}/{message_index}/{action}").hex
+
+def request_chat_reply(client: "BackendClient", backend_url: str, session_id: str, message: str,
+                       idempotency_key: str, cancel: Optional[threading.Event] = None) -> Dict:
+    """POST a message to /chat; raises BackendError. Safe off the script thread"""
+    response = client.request(
+        "POST",
+        backend_url,
+        "/chat",
+        "chat",
+        cancel=cancel,
+        json=build_chat_payload(message),
+        params=get_session_params(session_id),
+        headers={**get_session_headers(session_id), "Idempotency-Key": idempotency_key},
+        timeout=(CONNECT_TIMEOUT, 35)  # Slightly increased timeout
+    )
+    if cancel is not None and cancel.is_set():
+        response.close()
+    return chat_reply_from_response(response, cancel)
+
+def chat_reply_from_response(response, cancel: Optional[threading.Event] = None) -> Dict:
+    """Reply body of a /chat response from requests or httpx; raises BackendError"""
+    if cancel is not None and cancel.is_set():
+        # The reply arrived after a newer message replaced this one
+        raise BackendError(ERROR_CANCELLED, "Superseded by a newer request")
+    if response.status_code == 200:
+        return response.json()
+    raise BackendError(classify_status_code(response.status_code), f"{response.status_code} - {response.text}")
+
+async def request_chat_reply_async(backend: AsyncBackendClient, health_cache: "HealthCache", backend_url: str,
+                                   session_id: str, message: str, idempotency_key: str,
+                                   cancel: Optional[threading.Event] = None) -> Dict:
+    """request_chat_reply on the event loop, probing /health alongside when the cached result is stale
+
+    A fresh health result lets a slow reply be told apart from a cold start without a second wait.
+    """
+    chat = backend.request(
+        "POST",
+        backend_url,
+        "/chat",
+        "chat",
+        cancel=cancel,
+        json=build_chat_payload(message),
+        params=get_session_params(session_id),
+        headers={**get_session_headers(session_id), "Idempotency-Key": idempotency_key},
+        timeout=(CONNECT_TIMEOUT, 35)
+    )
+    if health_cache.needs_probe(backend_url):
+        response, _ = await asyncio.gather(chat, health_cache.refresh_on_loop(backend, backend_url))
+    else:
+        response = await chat
+    return chat_reply_from_response(response, cancel)
+
+def is_startup_failure(error_class: str) -> bool:
+    """Whether a failure means the backend is still waking up"""
+    if ERROR_POLICIES[error_class].startup:
+        return True
+    if error_class == ERROR_READ_TIMEOUT:
+        # A slow reply from a backend we know is up is a slow LLM call, not a cold start
+        health = get_health_cache().peek(st.session_state.backend_url)
+        return not (
+            health and health["status"] == "healthy"
+            and time.time() - health["checked_at"] < HEALTH_CACHE_STALE_TTL
         )
+    return False
 
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {
-                "message": f"Error: {response.status_code} - {response.text}",
-                "booking_data": None,
-                "suggested_times": [],
-                "requires_confirmation": False
-            }
-
-    except requests.exceptions.ReadTimeout as e:
-        # FIXED: Better detection of startup timeout
-        return handle_backend_startup_error()
-    
-    except requests.exceptions.ConnectTimeout as e:
+def handle_backend_error(error: BackendError) -> Dict:
+    """Turn a classified backend failure into a chat response"""
+    if is_startup_failure(error.error_class):
         return handle_backend_startup_error()
-    
-    except requests.exceptions.ConnectionError as e:
-        error_msg = str(e).lower()
-        # FIXED: Better detection of specific timeout errors
-        if any(keyword in error_msg for keyword in ['timeout', 'timed out', 'read timed out', 'connection pool']):
-            return handle_backend_startup_error()
-        else:
-            return {
-                "message": f"Connection error: {str(e)}. Please check if the backend is running.",
-                "booking_data": None,
-                "suggested_times": [],
-                "requires_confirmation": False
-            }
-        
-    except requests.exceptions.RequestException as e:
-        error_msg = str(e).lower()
-        # FIXED: Catch the specific error pattern user mentioned
-        if any(keyword in error_msg for keyword in ['timeout', 'timed out', 'read timed out', 'httpsconnectionpool']):
-            return handle_backend_startup_error()
-        else:
-            return {
-                "message": f"Request error: {str(e)}",
-                "booking_data": None,
-                "suggested_times": [],
-                "requires_confirmation": False
-            }
+    return {
+        "message": ERROR_POLICIES[error.error_class].message.format(detail=error.detail),
+        "booking_data": None,
+        "suggested_times": [],
+        "requires_confirmation": False,
+        "error_class": error.error_class
+    }
+
+@st.cache_resource
+def get_request_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool for backend calls"""
+    return ThreadPoolExecutor(max_workers=REQUEST_WORKERS, thread_name_prefix="backend-request")
+
+def request_in_flight() -> bool:
+    """Whether this session is waiting for a backend reply"""
+    return st.session_state.inflight is not None
+
+def supersede_pending_requests():
+    """Abandon the in-flight request and any startup-queued message in favour of a newer one"""
+    st.session_state.request_generation += 1
+    st.session_state.queued_message = None
+    st.session_state.queued_idempotency_key = None
+    st.session_state.queued_action_index = None
+    inflight = st.session_state.inflight
+    if inflight is None:
+        return
+    st.session_state.inflight = None
+    # A queued future never starts; a running one stops before its next attempt
+    inflight["cancel"].set()
+    inflight["future"].cancel()
+    logger.info("superseded in-flight request", extra={"idempotency_key": inflight["idempotency_key"]})
+
+def submit_chat_request(message: str, idempotency_key: Optional[str] = None, action_index: Optional[int] = None,
+                        cache_key: Optional[Tuple] = None, resends: int = 0):
+    """Send a message on the worker pool; the reply is appended by collect_inflight_reply()
+
+    `action_index` is the message whose button sent this, released again if the call fails.
+    A successful reply is stored in the response cache under `cache_key`.
+    `resends` counts earlier automatic re-sends of the same queued message.
+    """
+    supersede_pending_requests()
+    idempotency_key = idempotency_key or uuid.uuid4().hex
+    cancel = threading.Event()
+    backend = get_async_backend_client()
+    if backend is not None:
+        # One shared event loop instead of a pool thread per waiting request
+        future = backend.submit(request_chat_reply_async(
+            backend,
+            get_health_cache(),
+            st.session_state.backend_url,
+            st.session_state.session_id,
+            message,
+            idempotency_key,
+            cancel
+        ))
+    else:
+        future = get_request_executor().submit(
+            request_chat_reply,
+            get_backend_client(),
+            st.session_state.backend_url,
+            st.session_state.session_id,
+            message,
+            idempotency_key,
+            cancel
+        )
+    st.session_state.inflight = {
+        "future": future,
+        "cancel": cancel,
+        "generation": st.session_state.request_generation,
+        "message": message,
+        "idempotency_key": idempotency_key,
+        "action_index": action_index,
+        "cache_key": cache_key,
+        "resends": resends,
+        "started_at": time.time()
+    }
+
+def complete_chat_reply(message: str, response: Dict, idempotency_key: Optional[str] = None,
+                        action_index: Optional[int] = None, resends: int = 0):
+    """Record the assistant reply to a message, queueing the message if the backend is starting"""
+    if response.get("is_startup_error") and resends >= QUEUED_RESEND_LIMIT:
+        # /health answers but /chat keeps failing, so stop re-sending on our own
+        logger.warning("queued message failed after re-sends", extra={"idempotency_key": idempotency_key})
+        response = resend_limit_response(resends)
+    append_message(ChatMessage.from_response(response))
+    if response.get("booking_data"):
+        # The calendar changed, so cached availability no longer holds
+        st.session_state.calendar_version += 1
+        get_response_cache().invalidate_session(st.session_state.session_id)
+    if response.get("is_startup_error"):
+        # The automatic re-send reuses the key, so the backend sees one action
+        start_backend_wait(message, idempotency_key, action_index, resends)
+    elif response.get("error_class") and action_index is not None:
+        # Nothing was booked, so let the user press the button again
+        st.session_state.actioned_message_indices.discard(action_index)
+
+def collect_inflight_reply():
+    """Append the reply of a finished background request"""
+    inflight = st.session_state.inflight
+    if inflight is None or not inflight["future"].done():
+        return
+    st.session_state.inflight = None
+    if inflight["generation"] != st.session_state.request_generation or inflight["future"].cancelled():
+        return
+    try:
+        response = inflight["future"].result()
+    except BackendError as e:
+        if e.error_class == ERROR_CANCELLED:
+            return
+        response = handle_backend_error(e)
+    except Exception as e:
+        response = handle_backend_error(BackendError(ERROR_REQUEST, str(e)))
+    else:
+        if inflight["cache_key"] is not None and not response.get("booking_data"):
+            get_response_cache().put(inflight["cache_key"], response)
+    complete_chat_reply(inflight["message"], response, inflight["idempotency_key"], inflight["action_index"],
+                        inflight["resends"])
+
+@st.cache_resource
+def get_availability_support() -> Dict:
+    """Process-wide flag remembering whether the backend offers GET /availability"""
+    return {"supported": AVAILABILITY_ENABLED}
+
+def format_slot(slot) -> str:
+    """Button label for an /availability slot, given as a string or {"label"/"start", "end"}"""
+    if isinstance(slot, str):
+        return slot
+    if slot.get("label"):
+        return slot["label"]
+    start = datetime.fromisoformat(slot["start"].replace('Z', '+00:00'))
+    if start.tzinfo is not None:
+        start = start.astimezone(IST)
+    return f"{start.strftime('%A, %B %d at %I:%M %p')} IST"
+
+def availability_params(start_date: date, end_date: date, duration: int) -> Dict:
+    """Query parameters of a GET /availability call"""
+    return {
+        **get_session_params(),
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "duration": duration,
+        "timezone": "Asia/Kolkata"
+    }
+
+def parse_availability_response(response, support: Dict) -> Optional[List[str]]:
+    """Slot labels from an /availability response (requests or httpx), None to fall back to /chat"""
+    if response.status_code in (404, 405, 501):
+        # Backend has no structured endpoint: remember that and always use /chat
+        support["supported"] = False
+        return None
+    if response.status_code != 200:
+        logger.warning("availability lookup failed, falling back to /chat", extra={"status": response.status_code})
+        return None
+    try:
+        return [format_slot(slot) for slot in response.json().get("slots", [])]
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning("unexpected /availability body, falling back to /chat", extra={"error": str(e)})
+        return None
+
+async def fetch_availability_by_day(backend: AsyncBackendClient, backend_url: str, days: List[Dict], headers: Dict,
+                                    support: Dict) -> Optional[List[str]]:
+    """One concurrent /availability call per day, merged in date order; None if any day fails"""
+    responses = await asyncio.gather(*(
+        backend.request("GET", backend_url, "/availability", "availability", idempotent=True, max_attempts=1,
+                        params=params, headers=headers, timeout=(CONNECT_TIMEOUT, AVAILABILITY_TIMEOUT))
+        for params in days
+    ), return_exceptions=True)
+    slots = []
+    for response in responses:
+        if isinstance(response, BackendError):
+            logger.warning("availability lookup failed, falling back to /chat", extra={"error_class": response.error_class})
+            return None
+        if isinstance(response, BaseException):
+            raise response
+        day_slots = parse_availability_response(response, support)
+        if day_slots is None:
+            return None
+        slots.extend(day_slots)
+    return slots
+
+def fetch_availability(start_date: date, end_date: date, duration: int) -> Optional[List[str]]:
+    """Free slots from GET /availability; None when the backend can't answer structurally"""
+    support = get_availability_support()
+    if not support["supported"]:
+        return None
+    backend = get_async_backend_client()
+    if backend is not None and 0 < (end_date - start_date).days < AVAILABILITY_FANOUT_MAX_DAYS:
+        # Several days: ask for each day at once instead of one long range query
+        days = []
+        day = start_date
+        while day <= end_date:
+            days.append(availability_params(day, day, duration))
+            day += timedelta(days=1)
+        future = backend.submit(fetch_availability_by_day(
+            backend, st.session_state.backend_url, days, get_session_headers(), support
+        ))
+        try:
+            return future.result(timeout=CONNECT_TIMEOUT + AVAILABILITY_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning("availability lookup timed out, falling back to /chat")
+            return None
+    # Runs on the script thread, so one quick attempt; /chat answers if it fails
+    try:
+        response = get_backend_client().request(
+            "GET",
+            st.session_state.backend_url,
+            "/availability",
+            "availability",
+            idempotent=True,
+            max_attempts=1,
+            params=availability_params(start_date, end_date, duration),
+            headers=get_session_headers(),
+            timeout=(CONNECT_TIMEOUT, AVAILABILITY_TIMEOUT)
+        )
+    except BackendError as e:
+        logger.warning("availability lookup failed, falling back to /chat", extra={"error_class": e.error_class})
+        return None
+    return parse_availability_response(response, support)
+
+def answer_availability_query(prompt: str, start_date: date, end_date: date, duration: int) -> bool:
+    """Answer a free-slot question from /availability; False means send `prompt` to /chat instead"""
+    slots = fetch_availability(start_date, end_date, duration)
+    if slots is None:
+        return False
+    supersede_pending_requests()
+    if start_date == end_date:
+        period = "today" if start_date == get_ist_time().date() else start_date.strftime('%A, %B %d')
+    else:
+        period = f"{start_date.strftime('%B %d')} – {end_date.strftime('%B %d')}"
+    if slots:
+        content = f"Here are your free {duration}-minute slots for {period}:"
+    else:
+        content = f"You have no free {duration}-minute slots for {period}."
+    append_message(ChatMessage(ROLE_ASSISTANT, content, flags=ChatMessage.STRUCTURED_SLOTS, suggested_times=slots))
+    return True
+
+@st.cache_resource
+def get_streaming_support() -> Dict:
+    """Process-wide flag remembering whether the backend offers /chat/stream"""
+    return {"supported": True}
+
+def iter_sse_events(response: requests.Response) -> Iterator[Tuple[str, str]]:
+    """Yield (event, data) pairs from a server-sent events response"""
+    event, data_lines = "message", []
+    # SSE is always UTF-8, whatever requests guesses from a charset-less Content-Type. Split the
+    # raw bytes so characters like U+0085 or U+2028 inside a token aren't taken as line breaks
+    for raw_line in response.iter_lines():
+        if raw_line is None:
+            continue
+        line = raw_line.decode("utf-8", errors="replace")
+        if line == "":
+            if data_lines:
+                yield event, "\n".join(data_lines)
+            event, data_lines = "message", []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].lstrip(" "))
+    if data_lines:
+        yield event, "\n".join(data_lines)
+
+def stream_chat_tokens(response: requests.Response, final: Dict) -> Iterator[str]:
+    """Yield reply tokens from /chat/stream and fill `final` from the trailing frame"""
+    try:
+        for event, data in iter_sse_events(response):
+            frame = json.loads(data)
+            if event == "final" or frame.get("type") == "final":
+                final.update(frame)
+                break
+            token = frame.get("content", "")
+            if token:
+                yield token
+    except (requests.exceptions.RequestException, ValueError) as e:
+        final["interrupted"] = str(e)
+        yield "\n\n⚠️ *The response was interrupted. Please send your message again.*"
+    finally:
+        response.close()
+
+def write_stream(chunks: Iterable[str]) -> str:
+    """Render text chunks as they arrive, using st.write_stream when available"""
+    if hasattr(st, "write_stream"):
+        return st.write_stream(chunks)
+    placeholder = st.empty()
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        placeholder.markdown(text + "▌")
+    placeholder.markdown(text)
+    return text
+
+def stream_message_to_backend(message: str, idempotency_key: str) -> Optional[Dict]:
+    """Stream the reply into the current chat bubble; None means fall back to /chat"""
+    support = get_streaming_support()
+    if not STREAMING_ENABLED or not support["supported"]:
+        return None
+
+    try:
+        response = get_backend_client().request(
+            "POST",
+            st.session_state.backend_url,
+            "/chat/stream",
+            "chat_stream",
+            json=build_chat_payload(message),
+            params=get_session_params(),
+            headers={**get_session_headers(), "Accept": "text/event-stream", "Idempotency-Key": idempotency_key},
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, 35)
+        )
+    except BackendError as e:
+        return handle_backend_error(e)
+
+    content_type = response.headers.get("Content-Type", "")
+    if response.status_code in (404, 405, 501) or (
+        response.status_code == 200 and "text/event-stream" not in content_type
+    ):
+        # Backend doesn't stream: remember that and use the one-shot path
+        support["supported"] = False
+        response.close()
+        return None
+    if response.status_code != 200:
+        error = BackendError(classify_status_code(response.status_code), f"{response.status_code} - {response.text}")
+        response.close()
+        return handle_backend_error(error)
+
+    final = {}
+    text = write_stream(stream_chat_tokens(response, final))
+    return {
+        "message": final.get("message") or text,
+        "booking_data": final.get("booking_data"),
+        "suggested_times": final.get("suggested_times") or [],
+        "requires_confirmation": final.get("requires_confirmation", False),
+        "streamed": True
+    }
 
 def handle_backend_startup_error() -> Dict:
     """FIXED: Enhanced user-friendly message for backend startup delays"""
+    get_metrics_registry().inc("frontend_cold_start_detections")
     return {
         "message": "🚀 **AI Calendar Assistant is Starting Up**\n\n"
                   "The service is currently booting up from sleep mode. This is normal for cloud services after periods of inactivity.\n\n"
@@ -129,63 +1862,273 @@ def handle_backend_startup_error() -> Dict:
                   "- ⚡ Initializing backend service (50-60 seconds)\n"
                   "- 🔗 Connecting to Google Calendar API\n"
                   "- 🤖 Loading AI models\n\n"
-                  "💡 **What to do next:**\n"
-                  "1. ⏰ Wait for **60 seconds**\n"
-                  "2. 🔄 **Send your message again**\n"
+                  "💡 **What happens next:**\n"
+                  "1. 📡 We keep checking the service in the background\n"
+                  "2. 🔄 **Your message is sent automatically** as soon as it's ready\n"
                   "3. ✅ Once running, responses will be instant!\n\n"
-                  "🎯 **No need to refresh the page** - just wait and retry your message.",
+                  "🎯 **No need to refresh the page or resend** - just keep this tab open.",
         "booking_data": None,
         "suggested_times": [],
         "requires_confirmation": False,
         "is_startup_error": True
     }
 
-def check_backend_health() -> Dict:
-    """Check if backend is healthy and ready"""
-    try:
-        response = requests.get(
-            f"{st.session_state.backend_url}/health",
-            timeout=10
-        )
-        if response.status_code == 200:
-            return {"status": "healthy", "data": response.json()}
-        else:
-            return {"status": "unhealthy", "error": f"Status: {response.status_code}"}
-    except requests.exceptions.RequestException as e:
-        return {"status": "unhealthy", "error": str(e)}
+def resend_limit_response(resends: int) -> Dict:
+    """Chat response once a queued message has been re-sent as often as allowed"""
+    return {
+        "message": f"⚠️ **The assistant still isn't answering** after {resends} automatic re-send(s). "
+                   "The service reports it's up, but your message keeps failing. Please try again in a minute.",
+        "booking_data": None,
+        "suggested_times": [],
+        "requires_confirmation": False,
+        "error_class": ERROR_COLD_START
+    }
+
+class HealthCache:
+    """Process-wide /health results with a TTL, stale-while-revalidate and single-flight refresh"""
+
+    def __init__(self, client: BackendClient, ttl: float, stale_ttl: float):
+        self.client = client
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # backend_url -> last health result, with "checked_at"
+        self._inflight = {}  # backend_url -> Event set when the running probe finishes
+
+    def peek(self, backend_url: str) -> Optional[Dict]:
+        """Last known result, however old, without probing"""
+        with self._lock:
+            return self._entries.get(backend_url)
+
+    def get(self, backend_url: str) -> Dict:
+        """Cached result if fresh, stale result plus a background refresh, or a new probe"""
+        entry = self.peek(backend_url)
+        if entry is not None:
+            age = time.time() - entry["checked_at"]
+            if age < self.ttl:
+                return entry
+            if age < self.stale_ttl:
+                self.refresh_async(backend_url)
+                return entry
+        return self.refresh(backend_url)
+
+    def needs_probe(self, backend_url: str) -> bool:
+        """Whether the cached result is missing or past its TTL and no probe is running"""
+        with self._lock:
+            entry = self._entries.get(backend_url)
+            if backend_url in self._inflight:
+                return False
+        return entry is None or time.time() - entry["checked_at"] >= self.ttl
+
+    def begin_probe(self, backend_url: str) -> Tuple[threading.Event, bool]:
+        """The event set when this URL's probe finishes, and whether the caller must run it"""
+        with self._lock:
+            done = self._inflight.get(backend_url)
+            if done is not None:
+                return done, False
+            done = self._inflight[backend_url] = threading.Event()
+            return done, True
 
+    def finish_probe(self, backend_url: str, done: threading.Event, result: Optional[Dict]):
+        """Store a probe's result (None if it failed to run) and wake the callers waiting on it"""
+        with self._lock:
+            if result is not None:
+                result["checked_at"] = time.time()
+                self._entries[backend_url] = result
+            self._inflight.pop(backend_url, None)
+        done.set()
+
+    def refresh(self, backend_url: str, max_attempts: int = RETRY_MAX_ATTEMPTS) -> Dict:
+        """Probe /health now; concurrent callers share the probe already in flight"""
+        done, leader = self.begin_probe(backend_url)
+        if not leader:
+            done.wait(timeout=15)
+            return self.peek(backend_url) or {"status": "unhealthy", "error": "Health check still running"}
+
+        result = None
+        try:
+            result = self.client.check_health(backend_url, max_attempts)
+        finally:
+            self.finish_probe(backend_url, done, result)
+        return result
+
+    async def refresh_on_loop(self, backend: AsyncBackendClient, backend_url: str):
+        """Probe /health on the event loop unless a probe is already running"""
+        done, leader = self.begin_probe(backend_url)
+        if not leader:
+            return
+        result = None
+        try:
+            result = await backend.check_health(backend_url)
+        finally:
+            self.finish_probe(backend_url, done, result)
+
+    def refresh_async(self, backend_url: str):
+        """Start a background probe unless one is already running"""
+        with self._lock:
+            if backend_url in self._inflight:
+                return
+        threading.Thread(target=self.refresh, args=(backend_url,), name="health-refresh", daemon=True).start()
+
+@st.cache_resource
+def get_health_cache() -> HealthCache:
+    """Health cache shared by every session"""
+    return HealthCache(get_backend_client(), HEALTH_CACHE_TTL, HEALTH_CACHE_STALE_TTL)
+
+def get_backend_health() -> Dict:
+    """Backend health for this session's backend, served from the shared cache"""
+    return get_health_cache().get(st.session_state.backend_url)
+
+class BackendReadinessPoller:
+    """Probes /health from a background thread with exponential backoff until the backend answers"""
+
+    def __init__(self, backend_url: str, health_cache: HealthCache):
+        self.backend_url = backend_url
+        self.health_cache = health_cache
+        self._lock = threading.Lock()
+        self._thread = None
+        self.ready = False
+        self.gave_up = False
+        self.attempts = 0
+        self.last_error = None
+        self.started_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start probing unless a probe loop is already running"""
+        with self._lock:
+            if self.running:
+                return
+            self.ready = False
+            self.gave_up = False
+            self.attempts = 0
+            self.last_error = None
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="backend-readiness-poller", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self._poll()
+        except Exception as e:
+            logger.warning("backend readiness poller failed", extra={"error": str(e)}, exc_info=True)
+            self.last_error = str(e)
+        finally:
+            # The status panel waits for one of these, so never leave it spinning
+            if not self.ready:
+                self.gave_up = True
+
+    def _poll(self):
+        delay = READINESS_INITIAL_BACKOFF
+        deadline = self.started_at + READINESS_TIMEOUT
+        while True:
+            self.attempts += 1
+            # The poller's own backoff replaces per-probe retries
+            health = self.health_cache.refresh(self.backend_url, max_attempts=1)
+            if health["status"] == "healthy":
+                self.ready = True
+                return
+            self.last_error = health.get("error")
+            # Each failure class sets its own floor, e.g. DNS failures are not retried quickly
+            policy = ERROR_POLICIES.get(health.get("error_class"))
+            if policy:
+                delay = max(delay, policy.backoff)
+            if time.time() + delay > deadline:
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, READINESS_MAX_BACKOFF)
+
+@st.cache_resource
+def get_readiness_poller(backend_url: str) -> BackendReadinessPoller:
+    """One readiness poller per backend, shared by every session"""
+    return BackendReadinessPoller(backend_url, get_health_cache())
+
+def prewarm_backend(backend_url: str):
+    """Start probing the backend in the background unless it is known to be up"""
+    health = get_health_cache().peek(backend_url)
+    if health and health["status"] == "healthy" and time.time() - health["checked_at"] < HEALTH_CACHE_TTL:
+        return
+    get_readiness_poller(backend_url).start()
+
+class BackendKeepAlive:
+    """Pings /health on an interval so the backend never idles into sleep"""
+
+    def __init__(self, backend_url: str, health_cache: HealthCache, interval: float):
+        self.backend_url = backend_url
+        self.health_cache = health_cache
+        self.interval = interval
+        self._thread = threading.Thread(target=self._run, name="backend-keepalive", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.health_cache.refresh(self.backend_url)
+
+@st.cache_resource
+def start_backend_keepalive(backend_url: str) -> BackendKeepAlive:
+    """Start the process-wide keep-alive pinger for a backend once"""
+    return BackendKeepAlive(backend_url, get_health_cache(), KEEPALIVE_INTERVAL)
+
+def start_backend_wait(message: str, idempotency_key: Optional[str] = None, action_index: Optional[int] = None,
+                       resends: int = 0):
+    """Queue a message for automatic re-send and start polling backend readiness"""
+    st.session_state.queued_message = message
+    st.session_state.queued_idempotency_key = idempotency_key
+    st.session_state.queued_action_index = action_index
+    st.session_state.queued_resends = resends
+    get_readiness_poller(st.session_state.backend_url).start()
+
+def process_queued_message():
+    """Re-send the queued message as soon as the backend reports healthy"""
+    message = st.session_state.queued_message
+    if not message or request_in_flight() or not get_readiness_poller(st.session_state.backend_url).ready:
+        return
+
+    idempotency_key = st.session_state.queued_idempotency_key
+    action_index = st.session_state.queued_action_index
+    resends = st.session_state.queued_resends + 1
+    st.session_state.queued_message = None
+    logger.info("backend ready, re-sending queued message", extra={"idempotency_key": idempotency_key})
+    submit_chat_request(message, idempotency_key, action_index, resends=resends)
+
+@fragment(run_every=READINESS_POLL_SECONDS)
 def display_startup_helper():
-    """FIXED: Display helpful startup information"""
-    st.warning("🚀 **Backend Service Starting**")
-    
-    # Create a progress bar simulation
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    # Simulate startup progress
-    for i in range(101):
-        progress_bar.progress(i)
-        if i < 30:
-            status_text.text("🔄 Waking up the service...")
-        elif i < 60:
-            status_text.text("⚙️ Initializing AI components...")
-        elif i < 90:
-            status_text.text("🔗 Connecting to Google Calendar...")
-        else:
-            status_text.text("✅ Almost ready...")
-        time.sleep(0.5)  # 50 seconds total
-    
-    # Check if service is ready
-    health_status = check_backend_health()
-    
-    if health_status["status"] == "healthy":
-        st.success("✅ **Service is now ready!** You can send your message.")
-        progress_bar.empty()
-        status_text.empty()
-    else:
+    """FIXED: Display live backend readiness while a message is queued"""
+    poller = get_readiness_poller(st.session_state.backend_url)
+
+    if poller.ready:
+        st.success("✅ **Service is now ready!** Sending your message...")
+        st.rerun()
+
+    if poller.gave_up:
         st.warning("⏳ Service still starting up. Please wait a bit more and try again.")
-        progress_bar.empty()
-        status_text.empty()
+        if poller.last_error:
+            st.caption(f"Last error: {poller.last_error}")
+        if st.button("🔄 Check again", key="readiness_retry"):
+            poller.start()
+            st.rerun()
+        return
+
+    elapsed = int(time.time() - (poller.started_at or time.time()))
+    st.info(f"🚀 **Backend Service Starting** - waiting {elapsed}s, {poller.attempts} health check(s) so far. "
+            "Your message will be sent automatically.")
+
+def display_pending_reply():
+    """Placeholder reply while a background request runs"""
+    with st.chat_message("assistant"):
+        st.markdown("🔄 Connecting to AI Calendar Assistant...")
+
+@fragment(run_every=INFLIGHT_POLL_SECONDS)
+def watch_inflight_request():
+    """Rerun the app when a request sent during a full run finishes"""
+    # Requests sent from a live-tail rerun are polled by the tail, which may have taken the reply already
+    inflight = st.session_state.inflight
+    if inflight is not None and inflight["future"].done():
+        st.rerun()
 
 def enhanced_chat_input_handler():
     """FIXED: Enhanced chat input with better startup handling"""
@@ -194,47 +2137,37 @@ def enhanced_chat_input_handler():
         ist_time = get_ist_time()
 
         # Add user message to chat
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "timestamp": ist_time
-        })
+        append_message(ChatMessage(ROLE_USER, prompt))
 
         # Display user message immediately
         with st.chat_message("user"):
             st.markdown(prompt)
             st.caption(f"🕐 {ist_time.strftime('%I:%M %p')} IST")
 
-        # Get response from backend with startup handling
-        with st.chat_message("assistant"):
-            with st.spinner("🔄 Connecting to AI Calendar Assistant..."):
-                response = send_message_to_backend(prompt)
+        # Streamed replies render token by token here; others wait on the worker pool
+        response = None
+        idempotency_key = uuid.uuid4().hex
+        if STREAMING_ENABLED and get_streaming_support()["supported"]:
+            supersede_pending_requests()
+            with st.chat_message("assistant"):
+                response = stream_message_to_backend(prompt, idempotency_key)
+        if response is None:
+            submit_chat_request(prompt, idempotency_key)
+            display_pending_reply()
+            return
 
-            # FIXED: Better startup error handling
+        # FIXED: Better startup error handling - queue the message and poll readiness
+        with st.chat_message("assistant"):
             if response.get("is_startup_error"):
                 st.markdown(response["message"])
 
-                # Add countdown timer
-                countdown_placeholder = st.empty()
-                retry_button_placeholder = st.empty()
-
-                # Show countdown
-                for seconds in range(60, 0, -1):
-                    countdown_placeholder.info(f"⏳ **Startup in progress... Please wait {seconds} seconds**")
-                    time.sleep(1)
-
-                countdown_placeholder.success("✅ **Startup complete! You can now send your message again.**")
-
-                # Add a retry helper
-                with retry_button_placeholder.container():
-                    st.success("🎉 **Ready to go!** Send your message again using the input box below.")
-
             else:
-                # Normal response handling
-                st.markdown(response["message"])
+                # Streamed replies are already on screen, errors are not
+                if not response.get("streamed"):
+                    st.markdown(response["message"])
 
                 # Handle response components properly
-                message_index = len(st.session_state.messages)
+                message_index = get_message_count()
 
                 # Check what to display
                 has_booking = response.get("booking_data") and response.get("booking_data", {}).get("id")
@@ -245,7 +2178,6 @@ def enhanced_chat_input_handler():
                 if has_booking:
                     booking_id = response["booking_data"].get("id", "")
                     display_booking_confirmation(response["booking_data"], booking_id)
-                    st.session_state.last_booking_message_index = message_index
 
                 # Show confirmation prompt if needed (and no booking)
                 elif needs_confirmation and not has_booking:
@@ -254,18 +2186,9 @@ def enhanced_chat_input_handler():
                 # Show suggested times if available (and no booking or confirmation)
                 elif has_suggestions and not has_booking and not needs_confirmation:
                     display_suggested_times(response["suggested_times"], message_index)
-                    st.session_state.last_suggestion_message_index = message_index
 
         # Add assistant response to session
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response["message"],
-            "timestamp": ist_time,
-            "booking_data": response.get("booking_data"),
-            "suggested_times": response.get("suggested_times", []),
-            "requires_confirmation": response.get("requires_confirmation", False),
-            "is_startup_error": response.get("is_startup_error", False)
-        })
+        complete_chat_reply(prompt, response, idempotency_key)
 
 def display_connection_status():
     """FIXED: Display connection status in sidebar"""
@@ -274,10 +2197,14 @@ def display_connection_status():
         
         if st.button("🔍 Test Backend Connection"):
             with st.spinner("Testing connection..."):
-                health_status = check_backend_health()
+                health_status = get_backend_health()
+                # A probe still running elsewhere returns a placeholder without a check time
+                checked_at = health_status.get("checked_at")
+                checked_caption = f"Checked {int(time.time() - checked_at)}s ago" if checked_at else "Check still running"
                 
                 if health_status["status"] == "healthy":
                     st.success("✅ Backend is healthy and ready!")
+                    st.caption(checked_caption)
                     
                     # Show health details
                     health_data = health_status.get("data", {})
@@ -295,6 +2222,7 @@ def display_connection_status():
                 else:
                     st.error("❌ Backend connection failed")
                     st.error(f"Error: {health_status.get('error', 'Unknown error')}")
+                    st.caption(checked_caption)
                     
                     # Show startup instructions
                     st.warning("🚀 **If the service is starting up:**")
@@ -352,58 +2280,39 @@ def display_booking_confirmation(booking_data: Dict, booking_id: str):
         if booking_id and booking_id not in st.session_state.balloons_shown_for_booking:
             st.balloons()
             st.session_state.balloons_shown_for_booking.add(booking_id)
-            print(f"🎉 Balloons shown for booking: {booking_id}")
+            logger.debug("balloons shown", extra={"booking_id": booking_id})
         
         st.success("🎉 Your appointment has been added to your Google Calendar!")
 
-def handle_time_selection_callback(time_slot: str):
+def claim_message_action(message_index: int) -> bool:
+    """In-flight guard: only the first click on a message's buttons is acted on"""
+    if message_index in st.session_state.actioned_message_indices:
+        logger.info("ignoring repeated action", extra={"message_index": message_index})
+        return False
+    st.session_state.actioned_message_indices.add(message_index)
+    return True
+
+def handle_time_selection_callback(time_slot: str, message_index: int):
     """FIXED: Callback function for time slot selection"""
-    print(f"🕐 Time slot selected via callback: {time_slot}")
-    st.session_state.pending_time_selection = time_slot
+    if not claim_message_action(message_index):
+        return
+    logger.info("time slot selected", extra={"slot": time_slot, "message_index": message_index})
+    st.session_state.pending_time_selection = (time_slot, message_index)
 
 def process_pending_time_selection():
     """FIXED: Process pending time selection"""
     if st.session_state.pending_time_selection:
-        time_slot = st.session_state.pending_time_selection
+        time_slot, message_index = st.session_state.pending_time_selection
         st.session_state.pending_time_selection = None
         
-        print(f"🔄 Processing time selection: {time_slot}")
-        
-        # FIXED: Use IST timestamp
-        ist_time = get_ist_time()
-        
         # Add user selection to messages
-        st.session_state.messages.append({
-            "role": "user",
-            "content": time_slot,
-            "timestamp": ist_time,  # FIXED: IST timestamp
-            "is_time_selection": True
-        })
-        
-        # Process the selection
-        response = send_message_to_backend(time_slot)
-        
-        # Add assistant response
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response["message"],
-            "timestamp": ist_time,  # FIXED: IST timestamp
-            "booking_data": response.get("booking_data"),
-            "suggested_times": response.get("suggested_times", []),
-            "requires_confirmation": response.get("requires_confirmation", False)
-        })
+        append_message(ChatMessage(ROLE_USER, time_slot, flags=ChatMessage.TIME_SELECTION))
         
-        # Update tracking indices
-        if response.get("booking_data"):
-            st.session_state.last_booking_message_index = len(st.session_state.messages) - 1
-        
-        if response.get("suggested_times"):
-            st.session_state.last_suggestion_message_index = len(st.session_state.messages) - 1
-        
-        # Trigger rerun
-        st.rerun()
+        # Process the selection in the background
+        submit_chat_request(time_slot, action_idempotency_key(message_index, f"slot:{time_slot}"), message_index)
 
-def display_suggested_times(suggested_times: List[str], message_index: int):
+
+def display_suggested_times(suggested_times: List[str], message_index: int, structured: bool = False):
     """FIXED: Working time slot buttons with proper callback handling"""
     if suggested_times and len(suggested_times) > 0:
         st.info("🕐 **Available Time Slots**")
@@ -423,51 +2332,32 @@ def display_suggested_times(suggested_times: List[str], message_index: int):
                     help=f"Select {time_slot} for your appointment",
                     use_container_width=True,
                     on_click=handle_time_selection_callback,
-                    args=(time_slot,)
+                    # Structured slots never went through the LLM, so ask for the booking explicitly
+                    args=(f"Please book {time_slot}" if structured else time_slot, message_index),
+                    disabled=message_index in st.session_state.actioned_message_indices
                 )
 
-def handle_confirmation_callback(response: str):
+def handle_confirmation_callback(response: str, message_index: int):
     """FIXED: Callback function for confirmation"""
-    print(f"✅ Confirmation response via callback: {response}")
-    st.session_state.confirmation_pending = response
+    if not claim_message_action(message_index):
+        return
+    logger.info("confirmation answered", extra={"response": response, "message_index": message_index})
+    st.session_state.confirmation_pending = (response, message_index)
 
 def process_pending_confirmation():
     """FIXED: Process pending confirmation"""
     if st.session_state.confirmation_pending:
-        user_message = st.session_state.confirmation_pending
+        user_message, message_index = st.session_state.confirmation_pending
         st.session_state.confirmation_pending = None
         
-        print(f"🔄 Processing confirmation: {user_message}")
-        
-        # FIXED: Use IST timestamp
-        ist_time = get_ist_time()
-        
-        st.session_state.messages.append({
-            "role": "user",
-            "content": user_message,
-            "timestamp": ist_time,  # FIXED: IST timestamp
-            "is_confirmation": True
-        })
-        
-        response = send_message_to_backend(user_message)
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response["message"],
-            "timestamp": ist_time,  # FIXED: IST timestamp
-            "booking_data": response.get("booking_data"),
-            "suggested_times": response.get("suggested_times", []),
-            "requires_confirmation": response.get("requires_confirmation", False)
-        })
-        
-        if response.get("booking_data"):
-            st.session_state.last_booking_message_index = len(st.session_state.messages) - 1
-        
-        st.rerun()
+        append_message(ChatMessage(ROLE_USER, user_message, flags=ChatMessage.CONFIRMATION))
+        submit_chat_request(user_message, action_idempotency_key(message_index, f"confirm:{user_message}"), message_index)
 
 def display_confirmation_prompt(message_index: int):
     """FIXED: Display confirmation prompt with callback handling"""
     st.warning("⚠️ **Confirmation Required**")
     st.write("Please confirm if you'd like to proceed with this booking:")
+    already_answered = message_index in st.session_state.actioned_message_indices
     
     col1, col2 = st.columns(2)
     
@@ -478,7 +2368,8 @@ def display_confirmation_prompt(message_index: int):
             type="primary",
             use_container_width=True,
             on_click=handle_confirmation_callback,
-            args=("yes",)
+            args=("yes", message_index),
+            disabled=already_answered
         )
     
     with col2:
@@ -487,25 +2378,30 @@ def display_confirmation_prompt(message_index: int):
             key=f"confirm_no_{message_index}",
             use_container_width=True,
             on_click=handle_confirmation_callback,
-            args=("no, cancel",)
+            args=("no, cancel", message_index),
+            disabled=already_answered
         )
 
-def should_show_suggestions(message_index: int, message: Dict) -> bool:
+def should_show_suggestions(message_index: int, message: ChatMessage) -> bool:
     """Smarter logic for when to show suggestions"""
     # Don't show if no suggestions
-    if not message.get("suggested_times"):
+    if not message.suggested_times:
         return False
     
     # Don't show if there's booking data
-    if message.get("booking_data"):
+    if message.booking_data:
         return False
     
     # Only show for assistant messages
-    if message["role"] != "assistant":
+    if message.role != ROLE_ASSISTANT:
+        return False
+    
+    # Only the most recent actionable message keeps its time slots
+    if message_index != st.session_state.last_actionable_message_index:
         return False
     
     # Don't show if AI claims to have created/booked something
-    message_content = message.get("content", "").lower()
+    message_content = message.content.lower()
     booking_claim_phrases = [
         "i've created", "i've made", "i've added", "created the event",
         "added to your calendar", "event created", "successfully booked",
@@ -513,184 +2409,501 @@ def should_show_suggestions(message_index: int, message: Dict) -> bool:
     ]
     
     if any(phrase in message_content for phrase in booking_claim_phrases):
-        print(f"🚫 Not showing time slots - AI claims booking is done: {message_content[:50]}...")
+        logger.debug("hiding time slots of a reply that claims a booking")
         return False
     
-    # Check if this is the most recent message with suggestions
-    for later_index in range(message_index + 1, len(st.session_state.messages)):
-        later_msg = st.session_state.messages[later_index]
-        if later_msg["role"] == "assistant" and (
-            later_msg.get("suggested_times") or
-            later_msg.get("booking_data") or
-            later_msg.get("requires_confirmation")
-        ):
-            return False
-    
     return True
 
-def should_show_booking(message_index: int, message: Dict) -> bool:
+def should_show_booking(message_index: int, message: ChatMessage) -> bool:
     """Determine if booking confirmation should be shown"""
     # Must have booking data with valid ID
-    if not message.get("booking_data") or not message.get("booking_data", {}).get("id"):
+    if not message.booking_id:
         return False
     
     # Only show for assistant messages
-    if message["role"] != "assistant":
+    if message.role != ROLE_ASSISTANT:
         return False
     
     # Only show for the most recent booking message
-    return message_index == st.session_state.last_booking_message_index or message_index == len(st.session_state.messages) - 1
+    return message_index == st.session_state.last_booking_message_index or message_index == get_message_count() - 1
 
-def should_show_confirmation(message_index: int, message: Dict) -> bool:
+def should_show_confirmation(message_index: int, message: ChatMessage) -> bool:
     """Determine if confirmation prompt should be shown"""
     # Must require confirmation
-    if not message.get("requires_confirmation"):
+    if not message.requires_confirmation:
         return False
     
     # Only show for assistant messages
-    if message["role"] != "assistant":
+    if message.role != ROLE_ASSISTANT:
         return False
     
     # Don't show if there's already booking data
-    if message.get("booking_data"):
+    if message.booking_data:
         return False
     
     # Only show for the most recent confirmation request
-    for later_index in range(message_index + 1, len(st.session_state.messages)):
-        later_msg = st.session_state.messages[later_index]
-        if later_msg["role"] == "assistant" and (
-            later_msg.get("booking_data") or
-            later_msg.get("requires_confirmation")
-        ):
-            return False
-    
-    return True
+    return message_index == st.session_state.last_decision_message_index
 
-def main():
-    """Main Streamlit application with enhanced startup handling"""
-    init_session_state()
-    
-    # FIXED: Process pending actions at the start of each run
-    process_pending_time_selection()
-    process_pending_confirmation()
-    
-    # Header
-    st.title("🤖 AI Calendar Booking Assistant")
-    st.write("I can help you schedule appointments, check availability, and manage your calendar!")
-    
-    # FIXED: Show startup notice if this is the first visit
-    if len(st.session_state.messages) == 0:
-        st.info("💡 **First time today?** The service might take 30-60 seconds to start up if it's been sleeping. Please be patient!")
-    
-    # Sidebar with only quick actions and conversation management
+QUICK_ACTIONS = [
+    ("📅 Check Today's Availability", "What's my availability today?"),
+    ("📞 Schedule a Call", "I want to schedule a call"),
+    ("🗓️ Schedule Meeting Tomorrow", "Book a meeting tomorrow"),
+]
+
+# Only this many trailing messages are re-rendered by slot clicks and confirmations
+LIVE_TAIL_MAX_MESSAGES = 20
+
+# Answered from /availability when the backend supports it
+AVAILABILITY_QUICK_ACTION = "What's my availability today?"
+
+# Quick actions that only read the calendar, so a recent reply can be reused
+CACHEABLE_QUICK_ACTIONS = {AVAILABILITY_QUICK_ACTION}
+
+class ResponseCache:
+    """Process-wide TTL and LRU cache of backend replies to read-only prompts"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, response)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: Tuple, response: Dict):
+        with self._lock:
+            self._entries[key] = (time.time(), dict(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_session(self, session_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Reply cache shared by every session"""
+    return ResponseCache(RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES)
+
+def get_response_cache_key(prompt: str) -> Optional[Tuple]:
+    """Cache key for a read-only quick action, or None if its reply must not be reused"""
+    if RESPONSE_CACHE_TTL <= 0 or prompt not in CACHEABLE_QUICK_ACTIONS:
+        return None
+    ist_date = get_ist_time().date().isoformat()
+    return (st.session_state.session_id, prompt, ist_date, st.session_state.calendar_version)
+
+def handle_quick_action_callback(quick_message: str):
+    """Callback function for sidebar quick actions"""
+    st.session_state.pending_quick_action = quick_message
+
+def handle_availability_form_callback():
+    """Callback for the sidebar free-time form"""
+    dates = st.session_state.availability_dates
+    if not dates:
+        return
+    start_date, end_date = (dates[0], dates[-1]) if isinstance(dates, (list, tuple)) else (dates, dates)
+    st.session_state.pending_availability_query = (start_date, end_date, st.session_state.availability_duration)
+
+def process_pending_availability_query():
+    """Answer the free-time form, from /availability when possible"""
+    if st.session_state.pending_availability_query:
+        start_date, end_date, duration = st.session_state.pending_availability_query
+        st.session_state.pending_availability_query = None
+
+        if start_date == end_date:
+            prompt = f"Show my free {duration}-minute slots on {start_date.strftime('%A, %B %d')}"
+        else:
+            prompt = (f"Show my free {duration}-minute slots from {start_date.strftime('%A, %B %d')} "
+                      f"to {end_date.strftime('%A, %B %d')}")
+        append_message(ChatMessage(ROLE_USER, prompt))
+        if not answer_availability_query(prompt, start_date, end_date, duration):
+            submit_chat_request(prompt)
+
+def process_pending_quick_action():
+    """Process pending quick action"""
+    if st.session_state.pending_quick_action:
+        quick_message = st.session_state.pending_quick_action
+        st.session_state.pending_quick_action = None
+
+        append_message(ChatMessage(ROLE_USER, quick_message))
+        if quick_message == AVAILABILITY_QUICK_ACTION:
+            today = get_ist_time().date()
+            if answer_availability_query(quick_message, today, today, AVAILABILITY_DEFAULT_DURATION):
+                return
+        cache_key = get_response_cache_key(quick_message)
+        cached = get_response_cache().get(cache_key) if cache_key else None
+        if cached:
+            logger.info("serving cached reply", extra={"quick_action": quick_message})
+            supersede_pending_requests()
+            complete_chat_reply(quick_message, cached)
+        else:
+            submit_chat_request(quick_message, cache_key=cache_key)
+
+def display_message(message_index: int, message: ChatMessage, interactive: bool = True):
+    """Render one chat message with any actions it still offers"""
+    with st.chat_message(message.role):
+        # Display message content
+        st.markdown(message.content)
+        
+        # Show timestamp for user messages
+        if message.role == ROLE_USER and message.timestamp:
+            ts = datetime.fromtimestamp(message.timestamp, IST)
+            st.caption(f"🕐 {ts.strftime('%I:%M %p')} IST")
+
+        # Archived messages are shown read-only
+        if not interactive:
+            return
+        
+        # Only show booking confirmation for actual successful bookings
+        if should_show_booking(message_index, message):
+            display_booking_confirmation(message.booking_data, message.booking_id)
+        
+        # Only show confirmation prompt when needed
+        elif should_show_confirmation(message_index, message):
+            display_confirmation_prompt(message_index)
+        
+        # Smart time slot display
+        elif should_show_suggestions(message_index, message):
+            display_suggested_times(message.suggested_times, message_index, message.has_structured_slots)
+
+def get_live_tail_start() -> int:
+    """Index where the interactive end of the conversation begins"""
+    message_count = get_message_count()
+    actionable_index = st.session_state.last_actionable_message_index
+    if 0 <= actionable_index and message_count - actionable_index <= LIVE_TAIL_MAX_MESSAGES:
+        return actionable_index
+    return message_count
+
+def display_archived_history():
+    """Offer the archived start of the conversation and show the pages loaded so far"""
+    archived_count = st.session_state.archived_message_count
+    if archived_count == 0:
+        return
+    loaded = st.session_state.earlier_messages
+    first_loaded_index = archived_count - len(loaded)
+    if first_loaded_index > 0:
+        st.button(
+            f"⬆️ Load earlier messages ({first_loaded_index} archived)",
+            key="load_earlier_messages",
+            on_click=load_earlier_messages
+        )
+    if loaded:
+        st.button("⬇️ Hide earlier messages", key="hide_earlier_messages", on_click=hide_earlier_messages)
+    for offset, message in enumerate(loaded):
+        display_message(first_loaded_index + offset, message, interactive=False)
+
+def display_settled_history():
+    """Render the messages before the live tail; these never change on their own"""
+    tail_start = get_live_tail_start()
+    st.session_state.render_tail_start = tail_start
+    for message_index in range(st.session_state.archived_message_count, tail_start):
+        display_message(message_index, get_message(message_index))
+
+@fragment()
+def display_live_tail():
+    """Render the live end of the conversation; slot clicks, confirmations and their replies rerun only this"""
+    # FIXED: Process pending actions before rendering the replies they produce
+    was_queued = bool(st.session_state.queued_message)
+    with profile_phase("pending_actions"):
+        collect_inflight_reply()
+        process_pending_time_selection()
+        process_pending_confirmation()
+        process_pending_quick_action()
+        process_pending_availability_query()
+
+    # The readiness panel lives outside this fragment, so a newly queued message needs a full rerun
+    if in_fragment_rerun() and st.session_state.queued_message and not was_queued:
+        st.rerun()
+
+    with profile_phase("history_tail"):
+        first_index = max(st.session_state.render_tail_start, st.session_state.archived_message_count)
+        for message_index in range(first_index, get_message_count()):
+            display_message(message_index, get_message(message_index))
+
+    if request_in_flight():
+        display_pending_reply()
+        # Full runs are polled by watch_inflight_request; st.rerun can only target this fragment from its own reruns
+        if in_fragment_rerun():
+            with profile_phase("poll_wait"):
+                time.sleep(INFLIGHT_POLL_SECONDS)
+            st.rerun(scope="fragment")
+
+def display_sidebar():
+    """Sidebar with only quick actions and conversation management"""
     with st.sidebar:
         # Quick actions
         st.header("⚡ Quick Actions")
-        if st.button("📅 Check Today's Availability", use_container_width=True):
-            quick_message = "What's my availability today?"
-            st.session_state.messages.append({
-                "role": "user",
-                "content": quick_message,
-                "timestamp": get_ist_time()
-            })
-            response = send_message_to_backend(quick_message)
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response["message"],
-                "timestamp": get_ist_time(),
-                "suggested_times": response.get("suggested_times", [])
-            })
-            st.rerun()
-        if st.button("📞 Schedule a Call", use_container_width=True):
-            quick_message = "I want to schedule a call"
-            st.session_state.messages.append({
-                "role": "user",
-                "content": quick_message,
-                "timestamp": get_ist_time()
-            })
-            response = send_message_to_backend(quick_message)
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response["message"],
-                "timestamp": get_ist_time(),
-                "suggested_times": response.get("suggested_times", [])
-            })
-            st.rerun()
-        if st.button("🗓️ Schedule Meeting Tomorrow", use_container_width=True):
-            quick_message = "Book a meeting tomorrow"
-            st.session_state.messages.append({
-                "role": "user",
-                "content": quick_message,
-                "timestamp": get_ist_time()
-            })
-            response = send_message_to_backend(quick_message)
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response["message"],
-                "timestamp": get_ist_time(),
-                "suggested_times": response.get("suggested_times", [])
-            })
-            st.rerun()
+        for label, quick_message in QUICK_ACTIONS:
+            st.button(
+                label,
+                use_container_width=True,
+                on_click=handle_quick_action_callback,
+                args=(quick_message,)
+            )
+        # Free-slot lookup by date range and meeting length
+        with st.form("availability_form"):
+            today = get_ist_time().date()
+            durations = sorted({15, 30, 45, 60, 90, AVAILABILITY_DEFAULT_DURATION})
+            st.date_input("Dates", value=(today, today), min_value=today, key="availability_dates")
+            st.selectbox("Duration (minutes)", durations, index=durations.index(AVAILABILITY_DEFAULT_DURATION),
+                         key="availability_duration")
+            st.form_submit_button(
+                "🔎 Find Free Time",
+                use_container_width=True,
+                on_click=handle_availability_form_callback
+            )
         st.divider()
         # Conversation management
         st.header("💬 Conversation")
         if st.button("🗑️ Clear Conversation", use_container_width=True):
+            # Start a fresh backend conversation too
+            try:
+                get_message_archive().delete()
+            except OSError as e:
+                logger.warning("could not delete archived chat history", extra={"error": str(e)})
+            supersede_pending_requests()
+            st.session_state.session_id = new_session_id()
             st.session_state.messages = []
+            st.session_state.archived_message_count = 0
+            st.session_state.earlier_messages = []
             st.session_state.last_booking_message_index = -1
             st.session_state.last_suggestion_message_index = -1
+            rebuild_message_indices()
             st.session_state.balloons_shown_for_booking = set()
+            st.session_state.actioned_message_indices = set()
             st.session_state.pending_time_selection = None
             st.session_state.confirmation_pending = None
+            st.session_state.pending_quick_action = None
+            st.session_state.pending_availability_query = None
             st.rerun()
         # Show conversation stats
         if st.session_state.messages:
-            st.metric("Messages", len(st.session_state.messages))
-            user_messages = sum(1 for msg in st.session_state.messages if msg["role"] == "user")
-            assistant_messages = len(st.session_state.messages) - user_messages
+            message_count = get_message_count()
+            st.metric("Messages", message_count)
+            user_messages = st.session_state.user_message_count
+            assistant_messages = message_count - user_messages
             col1, col2 = st.columns(2)
             with col1:
                 st.metric("👤 You", user_messages)
             with col2:
                 st.metric("🤖 AI", assistant_messages)
+        display_diagnostics()
+        if profiling_enabled():
+            display_profile()
+
+def display_diagnostics():
+    """Sidebar panel with recent backend call timings per endpoint"""
+    with st.expander("🩺 Diagnostics"):
+        recorder = get_span_recorder()
+        rows = recorder.summary()
+        if not rows:
+            st.caption("No backend calls yet.")
+            return
+        st.caption(f"Last {DIAGNOSTICS_WINDOW} calls per endpoint. Times in ms; "
+                   "TTFB includes connection setup, script_run is the app's own rerun time.")
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        endpoint = st.selectbox("Latency histogram", [row["endpoint"] for row in rows], key="diagnostics_endpoint")
+        phase = st.radio("Phase", ["total", "ttfb"], horizontal=True, key="diagnostics_phase")
+        histogram = [{"latency": label, "calls": count} for label, count in recorder.histogram(endpoint, phase)]
+        st.dataframe(histogram, hide_index=True, use_container_width=True)
+
+class RerunProfiler:
+    """Phase timings of one script run, plus an optional whole-run profile written to disk"""
+
+    def __init__(self, run_number: int, dump_path: Optional[str]):
+        self.run_number = run_number
+        self.phases = {}
+        self.dump_path = dump_path
+        self.engine = None
+        if dump_path:
+            self.start_engine()
+        self.started = time.perf_counter()
+
+    def start_engine(self):
+        try:
+            if PROFILE_ENGINE == "pyinstrument" and PyinstrumentProfiler is not None:
+                self.engine = PyinstrumentProfiler()
+                self.engine.start()
+            else:
+                self.engine = cProfile.Profile()
+                self.engine.enable()
+        except (ValueError, RuntimeError) as e:
+            # Only one profiler can be active at a time; another session's run may hold it
+            logger.warning("skipping profile dump", extra={"run": self.run_number, "error": str(e)})
+            self.engine, self.dump_path = None, None
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self) -> Dict:
+        total = time.perf_counter() - self.started
+        if self.engine is not None:
+            try:
+                os.makedirs(os.path.dirname(self.dump_path), exist_ok=True)
+                if isinstance(self.engine, cProfile.Profile):
+                    self.engine.disable()
+                    self.engine.dump_stats(self.dump_path)
+                else:
+                    self.engine.stop()
+                    with open(self.dump_path, "w") as dump:
+                        dump.write(self.engine.output_html())
+            except OSError as e:
+                logger.warning("could not write profile", extra={"path": self.dump_path, "error": str(e)})
+                self.dump_path = None
+        return {"run": self.run_number, "total": total, "phases": dict(self.phases), "dump": self.dump_path}
+
+# The profiler of the script run on this thread, if profiling is on
+_profile_local = threading.local()
+
+def profiling_enabled() -> bool:
+    return PROFILE_RERUNS or get_query_param("profile") == "1"
+
+def profile_phase(name: str):
+    """Time a block as one phase of the current run; free when profiling is off"""
+    profiler = getattr(_profile_local, "profiler", None)
+    return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+def start_rerun_profiler() -> Optional[RerunProfiler]:
+    if not profiling_enabled():
+        return None
+    run_number = st.session_state.get("profile_run_count", 0) + 1
+    st.session_state.profile_run_count = run_number
+    dump_path = None
+    if PROFILE_DUMP_EVERY > 0 and run_number % PROFILE_DUMP_EVERY == 0:
+        extension = "html" if PROFILE_ENGINE == "pyinstrument" and PyinstrumentProfiler is not None else "prof"
+        session_key = st.session_state.get("metrics_session_key", "session")[:8]
+        dump_path = os.path.join(PROFILE_DIR, f"{session_key}-run{run_number:05d}.{extension}")
+    profiler = RerunProfiler(run_number, dump_path)
+    _profile_local.profiler = profiler
+    return profiler
+
+def finish_rerun_profiler(profiler: Optional[RerunProfiler]):
+    if profiler is None:
+        return
+    _profile_local.profiler = None
+    if "profile_runs" not in st.session_state:
+        st.session_state.profile_runs = deque(maxlen=PROFILE_HISTORY)
+    st.session_state.profile_runs.append(profiler.finish())
+
+def display_profile():
+    """Sidebar breakdown of recent script runs by phase"""
+    runs = st.session_state.get("profile_runs")
+    with st.expander("⏱️ Rerun Profile", expanded=True):
+        if not runs:
+            st.caption("Profiling starts with the next run.")
+            return
+        last = runs[-1]
+        phase_names = list(dict.fromkeys(name for run in runs for name in run["phases"]))
+        rows = []
+        for name in phase_names:
+            samples = [run["phases"][name] for run in runs if name in run["phases"]]
+            rows.append({
+                "phase": name,
+                "last_ms": round(last["phases"].get(name, 0.0) * 1000, 1),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 1),
+                "max_ms": round(max(samples) * 1000, 1),
+            })
+        st.caption(f"Run {last['run']} took {last['total'] * 1000:.1f} ms; mean over {len(runs)} runs shown too. "
+                   f"{get_message_count()} messages, {len(st.session_state.messages)} in memory.")
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        dumps = [run["dump"] for run in runs if run["dump"]]
+        if dumps:
+            st.caption(f"Latest profile: `{dumps[-1]}`")
+
+def main():
+    """Main Streamlit application with enhanced startup handling"""
+    with profile_phase("init_session_state"):
+        init_session_state()
+    if KEEPALIVE_INTERVAL > 0:
+        start_backend_keepalive(st.session_state.backend_url)
+    if METRICS_PORT > 0:
+        start_metrics_exporter()
+
+    with profile_phase("background_results"):
+        # Append a reply that finished in the background since the last run
+        collect_inflight_reply()
+
+        # FIXED: Re-send a message queued during backend startup
+        process_queued_message()
+    
+    # Header
+    st.title("🤖 AI Calendar Booking Assistant")
+    st.write("I can help you schedule appointments, check availability, and manage your calendar!")
+    
+    # FIXED: Show startup notice if this is the first visit and the backend isn't known to be up
+    health = get_health_cache().peek(st.session_state.backend_url)
+    if get_message_count() == 0 and not (health and health["status"] == "healthy"):
+        st.info("💡 **First time today?** The service might take 30-60 seconds to start up if it's been sleeping. Please be patient!")
     
     # Main chat interface
     chat_container = st.container()
     
-    # Display conversation history
+    # Display conversation history: settled messages, then the live tail
     with chat_container:
-        for message_index, message in enumerate(st.session_state.messages):
-            with st.chat_message(message["role"]):
-                # Display message content
-                st.markdown(message["content"])
-                
-                # Show timestamp for user messages
-                if message["role"] == "user" and message.get("timestamp"):
-                    try:
-                        if isinstance(message["timestamp"], str):
-                            ts = datetime.fromisoformat(message["timestamp"].replace('Z', '+00:00'))
-                        else:
-                            ts = message["timestamp"]
-                        st.caption(f"🕐 {ts.strftime('%I:%M %p')} IST")
-                    except:
-                        pass
-                
-                # Only show booking confirmation for actual successful bookings
-                if should_show_booking(message_index, message):
-                    booking_id = message["booking_data"].get("id", "")
-                    display_booking_confirmation(message["booking_data"], booking_id)
-                
-                # Only show confirmation prompt when needed
-                elif should_show_confirmation(message_index, message):
-                    display_confirmation_prompt(message_index)
-                
-                # Smart time slot display
-                elif should_show_suggestions(message_index, message):
-                    display_suggested_times(message["suggested_times"], message_index)
+        with profile_phase("history"):
+            display_archived_history()
+            display_settled_history()
+        display_live_tail()
+    
+    # Sidebar after the chat so its stats include replies handled this run
+    with profile_phase("sidebar"):
+        display_sidebar()
     
     # FIXED: Use enhanced chat input handler
-    enhanced_chat_input_handler()
+    with profile_phase("chat_input"):
+        enhanced_chat_input_handler()
+
+    with profile_phase("status_panels"):
+        # Rerun once a reply sent during this run is ready
+        if request_in_flight():
+            watch_inflight_request()
+
+        # Live readiness while a message waits for the backend to wake up
+        if st.session_state.queued_message:
+            display_startup_helper()
+
+    # Without fragments, poll with short reruns instead of one long sleep
+    if not FRAGMENTS_AVAILABLE:
+        if request_in_flight():
+            with profile_phase("poll_wait"):
+                time.sleep(INFLIGHT_POLL_SECONDS)
+            st.rerun()
+        if st.session_state.queued_message:
+            poller = get_readiness_poller(st.session_state.backend_url)
+            if poller.running or poller.ready:
+                with profile_phase("poll_wait"):
+                    time.sleep(READINESS_POLL_SECONDS)
+                st.rerun()
     
     # ...footer removed as requested...
 
 if __name__ == "__main__":
-    main()
+    script_started = time.perf_counter()
+    profiler = start_rerun_profiler()
+    try:
+        main()
+    finally:
+        finish_rerun_profiler(profiler)
+        record_script_run(time.perf_counter() - script_started)
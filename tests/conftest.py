@@ -0,0 +1,11 @@
+"""Make streamlit_app importable from the tests without touching a real backend."""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Read once at import time; nothing here should start background probes
+os.environ.setdefault("BACKEND_URL", "http://127.0.0.1:9")
+os.environ.setdefault("PREWARM_ENABLED", "false")
+os.environ.setdefault("METRICS_PORT", "0")
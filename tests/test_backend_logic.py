@@ -0,0 +1,228 @@
+"""Unit tests for the app's pure backend logic: classification, retries, breaker, caches, SSE and metrics."""
+import json
+import socket
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("pytz")
+requests = pytest.importorskip("requests")
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError  # noqa: E402
+
+import streamlit_app as app  # noqa: E402
+from backend_errors import BackendError  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, lines=()):
+        self.status_code = status_code
+        self.headers = {}
+        self._body = body
+        self._lines = lines
+        self.content = b"" if body is None else body.encode()
+        self.text = body or ""
+        self.closed = False
+
+    def json(self):
+        return json.loads(self._body)
+
+    def iter_lines(self):
+        return iter(self._lines)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Answers every request with the next status code and remembers the calls"""
+
+    def __init__(self, *status_codes):
+        self.status_codes = list(status_codes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        status_code = self.status_codes.pop(0) if len(self.status_codes) > 1 else self.status_codes[0]
+        return FakeResponse(status_code, "{}")
+
+
+def connection_error(reason):
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/chat", reason=reason))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, "retry_delay", lambda attempt: 0.0)
+
+    def make(*status_codes):
+        return app.BackendClient(FakeSession(*status_codes), app.SpanRecorder(10), app.MetricsRegistry(300))
+    return make
+
+
+def test_refused_connection_is_not_a_connect_timeout():
+    # NewConnectionError subclasses ConnectTimeoutError in urllib3
+    refused = NewConnectionError(None, "Failed to establish a new connection: [Errno 111] Connection refused")
+    assert app.classify_request_exception(connection_error(refused)) == app.ERROR_CONNECTION
+
+
+def test_classify_request_exception():
+    assert app.classify_request_exception(connection_error(ConnectTimeoutError(None, "timed out"))) == \
+        app.ERROR_CONNECT_TIMEOUT
+    assert app.classify_request_exception(connection_error(socket.gaierror(-2, "Name or service not known"))) == \
+        app.ERROR_DNS
+    assert app.classify_request_exception(requests.exceptions.ConnectTimeout()) == app.ERROR_CONNECT_TIMEOUT
+    assert app.classify_request_exception(requests.exceptions.ReadTimeout()) == app.ERROR_READ_TIMEOUT
+    assert app.classify_request_exception(requests.exceptions.SSLError()) == app.ERROR_TLS
+    assert app.classify_request_exception(requests.exceptions.InvalidURL()) == app.ERROR_REQUEST
+
+
+@pytest.mark.parametrize("status_code, outcome", [
+    (200, app.OUTCOME_OK),
+    (404, app.ERROR_CLIENT),
+    (500, app.ERROR_SERVER),
+    (502, app.ERROR_GATEWAY),
+    (503, app.ERROR_COLD_START),
+    (504, app.ERROR_GATEWAY),
+])
+def test_classify_status_code(status_code, outcome):
+    assert app.classify_status_code(status_code) == outcome
+
+
+@pytest.mark.parametrize("status_code", [502, 504])
+def test_gateway_errors_do_not_retry_posts(client, status_code):
+    backend = client(status_code)
+    response = backend.request("POST", "http://backend", "/chat", "chat")
+    assert response.status_code == status_code
+    assert len(backend.http_session.calls) == 1
+
+
+def test_gateway_errors_retry_idempotent_calls(client):
+    backend = client(504, 504, 200)
+    response = backend.request("GET", "http://backend", "/availability", "availability", idempotent=True)
+    assert response.status_code == 200
+    assert len(backend.http_session.calls) == 3
+
+
+def test_cold_start_retries_posts(client):
+    backend = client(503, 200)
+    assert backend.request("POST", "http://backend", "/chat", "chat").status_code == 200
+    assert len(backend.http_session.calls) == 2
+
+
+def test_gateway_error_is_not_queued_for_resend():
+    response = app.handle_backend_error(BackendError(app.ERROR_GATEWAY, "504 - Gateway Timeout"))
+    assert response["error_class"] == app.ERROR_GATEWAY
+    assert not response.get("is_startup_error")
+
+
+def test_health_result_without_json_body_is_unhealthy(client):
+    backend = client(200)
+    health = backend.health_result("http://backend", FakeResponse(200, "<html>starting</html>"))
+    assert health["status"] == "unhealthy"
+    assert backend.health_result("http://backend", FakeResponse(200, '{"status": "ok"}'))["status"] == "healthy"
+
+
+def test_circuit_breaker_opens_and_lets_one_trial_through(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    breaker = app.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow_request()
+
+    now[0] += 30
+    assert breaker.allow_request()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+    breaker.record_probe_success()
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_response_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    cache = app.ResponseCache(ttl=60, max_entries=2)
+
+    assert cache.get(("s1", "a")) is None
+    cache.put(("s1", "a"), {"message": "a"})
+    cached = cache.get(("s1", "a"))
+    assert cached == {"message": "a"}
+    cached["message"] = "changed"
+    assert cache.get(("s1", "a")) == {"message": "a"}
+
+    cache.put(("s1", "b"), {"message": "b"})
+    cache.get(("s1", "a"))
+    cache.put(("s2", "c"), {"message": "c"})
+    assert cache.get(("s1", "b")) is None  # least recently used
+    assert cache.get(("s1", "a")) is not None
+
+    cache.invalidate_session("s1")
+    assert cache.get(("s1", "a")) is None
+    now[0] += 61
+    assert cache.get(("s2", "c")) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_iter_sse_events():
+    response = FakeResponse(200, lines=[
+        b": keep-alive",
+        b"data: Hello",
+        b"",
+        b"data: caf\xc3\xa9 \xe2\x80\xa8 \xc2\x85 ok",
+        b"",
+        b"event: final",
+        b"data: {\"a\": 1,",
+        b"data:  \"b\": 2}",
+        b"",
+        b"data: unterminated",
+    ])
+    assert list(app.iter_sse_events(response)) == [
+        ("message", "Hello"),
+        ("message", "caf\u00e9 \u2028 \u0085 ok"),
+        ("final", "{\"a\": 1,\n\"b\": 2}"),
+        ("message", "unterminated"),
+    ]
+
+
+def test_metrics_registry_render(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    registry = app.MetricsRegistry(session_ttl=300)
+    registry.inc("frontend_script_runs")
+    registry.inc("frontend_script_runs")
+    registry.observe("frontend_backend_request_duration_seconds", 0.2, (("endpoint", "chat"), ("outcome", "ok")))
+    registry.observe_session("tab-1", 12)
+    registry.add_collector(lambda: {("frontend_response_cache_entries", ()): 3})
+
+    text = registry.render()
+    lines = text.splitlines()
+    assert lines[-1] == "# EOF"
+    assert "frontend_script_runs_total 2.0" in lines
+    assert 'frontend_backend_request_duration_seconds_bucket{endpoint="chat",outcome="ok",le="0.1"} 0' in lines
+    assert 'frontend_backend_request_duration_seconds_bucket{endpoint="chat",outcome="ok",le="0.25"} 1' in lines
+    assert 'frontend_backend_request_duration_seconds_count{endpoint="chat",outcome="ok"} 1' in lines
+    assert "frontend_active_sessions 1" in lines
+    assert "frontend_response_cache_entries 3" in lines
+    assert "frontend_session_history_messages_gcount 1" in lines
+
+    now[0] += 301
+    assert "frontend_active_sessions 0" in registry.render().splitlines()
+
+
+def test_observe_session_prunes_without_a_scrape(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    registry = app.MetricsRegistry(session_ttl=300)
+    registry.observe_session("old-tab", 1)
+    now[0] += 301
+    registry.observe_session("new-tab", 1)
+    assert list(registry._sessions) == ["new-tab"]
@@ -0,0 +1,203 @@
+"""End-to-end benchmark of streamlit_app.py driven headlessly through AppTest.
+
+Starts the stub backend in-process, points the app at it and replays scripted
+conversations (chat turn, slot selection, confirmation, quick action) on top
+of pre-loaded histories. Per-step script time, time-to-first-render and memory
+are written as JSON so regressions can be compared between commits. Usage:
+
+    python tools/bench_app.py --history 0 100 1000 5000 --cycles 3 --output bench.json
+
+Step times come from the app's own rerun profiler (PROFILE_RERUNS), summed over
+every script run a step triggers and excluding polling sleeps. AppTest waits
+for a run in 100 ms polls, so its wall time (wall_ms) hides render costs.
+AppTest doesn't run fragments on a timer, so after a step that starts a
+background request the tool waits for the reply and reruns once to append it.
+Time spent waiting is not counted.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+TOOLS_DIR = Path(__file__).resolve().parent
+APP_PATH = TOOLS_DIR.parent / "streamlit_app.py"
+sys.path.insert(0, str(TOOLS_DIR))
+
+from bench_history import make_history  # noqa: E402
+from stub_backend import StubBackend, StubConfig  # noqa: E402
+
+QUICK_ACTION_LABEL = "📅 Check Today's Availability"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def latest_button(at: AppTest, prefix: str):
+    """The button with `prefix` belonging to the newest message, or None"""
+    matches = [button for button in at.button if button.key and button.key.startswith(prefix)]
+    if not matches:
+        return None
+    return max(matches, key=lambda button: int(button.key[len(prefix):].split("_")[0]))
+
+
+def wait_for_reply(at: AppTest, timeout: float) -> AppTest:
+    """Once a background reply is ready, rerun to append it, as the in-flight fragment would in a browser"""
+    try:
+        inflight = at.session_state["inflight"]
+    except KeyError:
+        return at
+    if inflight is None:
+        return at
+    deadline = time.time() + timeout
+    while not inflight["future"].done():
+        if time.time() > deadline:
+            raise TimeoutError("No backend reply within the timeout")
+        time.sleep(0.005)
+    return at.run()
+
+
+def check(at: AppTest, step: str):
+    if at.exception:
+        raise RuntimeError(f"{step} raised: {at.exception[0].value}")
+
+
+def profiled_runs(at: AppTest) -> Tuple[int, List[Dict]]:
+    """Number of profiled script runs so far and the recent ones kept in session state"""
+    try:
+        return at.session_state["profile_run_count"], list(at.session_state["profile_runs"])
+    except KeyError:
+        return 0, []
+
+
+class Recorder:
+    """Times script runs per scenario step, optionally tracking Python heap peaks"""
+
+    def __init__(self, track_memory: bool):
+        self.track_memory = track_memory
+        self.samples = {}  # (step, history) -> {"ms": [...], "wall_ms": [...], "runs": [...], "peak_kb": [...]}
+
+    def measure(self, step: str, history: int, at: AppTest, action: Callable[[], AppTest]) -> AppTest:
+        runs_before, _ = profiled_runs(at)
+        if self.track_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        at = action()
+        wall = time.perf_counter() - start
+        check(at, step)
+        runs_after, recent = profiled_runs(at)
+        new_runs = recent[len(recent) - min(runs_after - runs_before, len(recent)):]
+        if not new_runs:
+            raise RuntimeError(f"{step} recorded no script run; is PROFILE_RERUNS set?")
+        script = sum(run["total"] - run["phases"].get("poll_wait", 0.0) for run in new_runs)
+        bucket = self.samples.setdefault((step, history), {"ms": [], "wall_ms": [], "runs": [], "peak_kb": []})
+        bucket["ms"].append(script * 1000)
+        bucket["wall_ms"].append(wall * 1000)
+        bucket["runs"].append(len(new_runs))
+        if self.track_memory:
+            bucket["peak_kb"].append(tracemalloc.get_traced_memory()[1] / 1024)
+        return at
+
+    def results(self) -> List[Dict]:
+        rows = []
+        for (step, history), bucket in self.samples.items():
+            ms = bucket["ms"]
+            rows.append({
+                "step": step,
+                "history": history,
+                "runs": len(ms),
+                "median_ms": statistics.median(ms),
+                "p95_ms": percentile(ms, 0.95),
+                "max_ms": max(ms),
+                "median_wall_ms": statistics.median(bucket["wall_ms"]),
+                "script_runs": sum(bucket["runs"]),
+                "peak_heap_kb": max(bucket["peak_kb"]) if bucket["peak_kb"] else None,
+                "samples_ms": ms,
+            })
+        return rows
+
+
+def run_conversation(recorder: Recorder, history_size: int, cycles: int, idle_reruns: int, timeout: float):
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    at.session_state["messages"] = make_history(history_size)
+    at = recorder.measure("first_render", history_size, at, at.run)
+
+    for _ in range(idle_reruns):
+        at = recorder.measure("idle_rerun", history_size, at, at.run)
+
+    for _ in range(cycles):
+        at = recorder.measure("chat_turn", history_size, at, lambda: wait_for_reply(
+            at.chat_input[0].set_value("Book a meeting tomorrow").run(), timeout))
+
+        slot = latest_button(at, "slot_")
+        if slot is None:
+            raise RuntimeError("No time slot buttons after the chat turn")
+        at = recorder.measure("slot_selection", history_size, at, lambda: wait_for_reply(slot.click().run(), timeout))
+
+        confirm = latest_button(at, "confirm_yes_")
+        if confirm is None:
+            raise RuntimeError("No confirmation prompt after selecting a slot")
+        at = recorder.measure("confirmation", history_size, at, lambda: wait_for_reply(confirm.click().run(), timeout))
+
+        quick_action = next(button for button in at.button if button.label == QUICK_ACTION_LABEL)
+        at = recorder.measure("quick_action", history_size, at, lambda: wait_for_reply(quick_action.click().run(), timeout))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 100, 1000, 5000])
+    parser.add_argument("--cycles", type=int, default=3, help="chat/slot/confirm/quick-action cycles per history size")
+    parser.add_argument("--idle-reruns", type=int, default=5)
+    parser.add_argument("--latency", default="fixed:0", help="stub /chat latency distribution")
+    parser.add_argument("--no-stream", dest="stream", action="store_false", help="serve only the one-shot /chat")
+    parser.add_argument("--memory", action="store_true", help="track Python heap peaks (slows every run)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    stub_config = StubConfig(latency=args.latency, health_latency="fixed:0", stream=args.stream, token_delay=0)
+    recorder = Recorder(args.memory)
+    if args.memory:
+        tracemalloc.start()
+
+    with StubBackend(stub_config) as backend_url:
+        os.environ["BACKEND_URL"] = backend_url
+        # Session-start /health probes would add background stub traffic to the timed runs
+        os.environ.setdefault("PREWARM_ENABLED", "false")
+        # Replies arrive on a worker thread; poll for them often so waits don't dominate the timings
+        os.environ.setdefault("INFLIGHT_POLL_SECONDS", "0.02")
+        # Per-run timings measured inside the script; see the module docstring
+        os.environ["PROFILE_RERUNS"] = "true"
+        for history_size in args.history:
+            run_conversation(recorder, history_size, args.cycles, args.idle_reruns, args.timeout)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "stub": vars(stub_config),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": recorder.results(),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
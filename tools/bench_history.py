@@ -0,0 +1,193 @@
+"""Benchmark the per-rerun cost of the chat history display decisions.
+
+Runs the app's should_show_* functions inside a Streamlit AppTest session
+for growing history sizes, next to the previous implementation that scanned
+every later message through st.session_state. Both are timed inside the
+script under the same harness. Two history shapes are measured: "dense",
+where every turn offers slots, asks for confirmation or books, and "sparse",
+where plain Q&A turns follow each slot offer and confirmation prompt so each
+old scan runs far before reaching the next actionable message. Usage:
+
+    python tools/bench_history.py [--sizes 10 100 1000 10000] [--repeat 3] [--shapes dense sparse]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# The decisions need no backend: never pre-warm, and never fall back to the production URL
+os.environ.setdefault("PREWARM_ENABLED", "false")
+os.environ.setdefault("BACKEND_URL", "http://127.0.0.1:9")
+
+
+def decision_script():
+    """AppTest script: time one pass of the history display decisions"""
+    import time
+
+    import streamlit as st
+
+    import streamlit_app as app
+
+    app.init_session_state()
+    start = time.perf_counter()
+    for message_index, message in enumerate(st.session_state.messages):
+        if app.should_show_booking(message_index, message):
+            pass
+        elif app.should_show_confirmation(message_index, message):
+            pass
+        elif app.should_show_suggestions(message_index, message):
+            pass
+    # The sidebar's message counts
+    st.session_state.user_message_count
+    st.session_state.bench_seconds = time.perf_counter() - start
+
+
+def legacy_script():
+    """AppTest script: the pre-index decisions, each rescanning later messages in session state"""
+    import time
+
+    import streamlit as st
+
+    booking_claim_phrases = [
+        "i've created", "i've made", "i've added", "created the event",
+        "added to your calendar", "event created", "successfully booked",
+        "appointment has been", "i'm creating", "let me create", "i've now booked"
+    ]
+
+    def should_show_suggestions(message_index, message):
+        if not message.get("suggested_times") or message.get("booking_data") or message["role"] != "assistant":
+            return False
+        if any(phrase in message.get("content", "").lower() for phrase in booking_claim_phrases):
+            return False
+        for later_index in range(message_index + 1, len(st.session_state.messages)):
+            later_msg = st.session_state.messages[later_index]
+            if later_msg["role"] == "assistant" and (
+                later_msg.get("suggested_times") or later_msg.get("booking_data")
+                or later_msg.get("requires_confirmation")
+            ):
+                return False
+        return True
+
+    def should_show_booking(message_index, message):
+        if not message.get("booking_data") or not message.get("booking_data", {}).get("id"):
+            return False
+        if message["role"] != "assistant":
+            return False
+        return (message_index == st.session_state.last_booking_message_index
+                or message_index == len(st.session_state.messages) - 1)
+
+    def should_show_confirmation(message_index, message):
+        if not message.get("requires_confirmation") or message["role"] != "assistant" or message.get("booking_data"):
+            return False
+        for later_index in range(message_index + 1, len(st.session_state.messages)):
+            later_msg = st.session_state.messages[later_index]
+            if later_msg["role"] == "assistant" and (
+                later_msg.get("booking_data") or later_msg.get("requires_confirmation")
+            ):
+                return False
+        return True
+
+    st.session_state.last_booking_message_index = max(
+        (i for i, m in enumerate(st.session_state.messages) if m.get("booking_data")), default=-1
+    )
+    start = time.perf_counter()
+    for message_index, message in enumerate(st.session_state.messages):
+        if should_show_booking(message_index, message):
+            pass
+        elif should_show_confirmation(message_index, message):
+            pass
+        elif should_show_suggestions(message_index, message):
+            pass
+    # The sidebar also recounted user messages on every rerun
+    sum(1 for message in st.session_state.messages if message["role"] == "user")
+    st.session_state.bench_seconds = time.perf_counter() - start
+
+
+def make_history(size: int, plain_turns: int = 0) -> List[Dict]:
+    """Build a scheduling conversation: ask, pick a slot, confirm, book
+
+    `plain_turns` question/answer pairs without any actions come after the slot offer
+    and after the confirmation prompt, so those stay pending for a while.
+    """
+    slots = ["Tomorrow at 10:00 AM", "Tomorrow at 02:00 PM", "Tomorrow at 04:00 PM"]
+    plain = [({"role": "user", "content": "What else is on my calendar this week?"},
+              {"role": "assistant", "content": "You have two other meetings this week."})] * plain_turns
+    turns = [
+        ({"role": "user", "content": "Book a meeting tomorrow"},
+         {"role": "assistant", "content": "Here are some free times.", "suggested_times": slots}),
+        *plain,
+        ({"role": "user", "content": slots[1], "is_time_selection": True},
+         {"role": "assistant", "content": "Shall I book it?", "requires_confirmation": True}),
+        *plain,
+        ({"role": "user", "content": "yes", "is_confirmation": True},
+         {"role": "assistant", "content": "Done!", "booking_data": {"id": "evt", "title": "Meeting"}}),
+    ]
+    history = []
+    turn = 0
+    while len(history) < size:
+        user, assistant = turns[turn % len(turns)]
+        history.append(dict(user))
+        history.append(dict(assistant))
+        turn += 1
+    return history[:size]
+
+
+HISTORY_SHAPES = {
+    "dense": lambda size: make_history(size),
+    "sparse": lambda size: make_history(size, plain_turns=20),
+}
+
+
+def time_script(script: Callable, history: List[Dict], repeat: int) -> float:
+    """Fastest in-script time of `repeat` AppTest runs over a copy of `history`"""
+    timings = []
+    for _ in range(repeat):
+        at = AppTest.from_function(script, default_timeout=300)
+        at.session_state["messages"] = [dict(message) for message in history]
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        timings.append(at.session_state["bench_seconds"])
+    return min(timings)
+
+
+def run(sizes: List[int], repeat: int, legacy_limit: int, shapes: List[str]) -> List[Dict]:
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            history = HISTORY_SHAPES[shape](size)
+            indexed = time_script(decision_script, history, repeat)
+            legacy = time_script(legacy_script, history, repeat) if size <= legacy_limit else None
+            results.append({
+                "shape": shape,
+                "messages": size,
+                "indexed_ms": indexed * 1000,
+                "indexed_us_per_message": indexed * 1e6 / size,
+                "legacy_ms": legacy * 1000 if legacy is not None else None,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--shapes", nargs="+", choices=sorted(HISTORY_SHAPES), default=["dense", "sparse"])
+    parser.add_argument("--legacy-limit", type=int, default=10000,
+                        help="skip the old implementation above this many messages")
+    args = parser.parse_args()
+
+    print(f"{'shape':>7} {'messages':>10} {'indexed ms':>12} {'us/message':>12} {'legacy ms':>12}")
+    for row in run(args.sizes, args.repeat, args.legacy_limit, args.shapes):
+        legacy = f"{row['legacy_ms']:.2f}" if row["legacy_ms"] is not None else "-"
+        print(f"{row['shape']:>7} {row['messages']:>10} {row['indexed_ms']:>12.2f} "
+              f"{row['indexed_us_per_message']:>12.2f} {legacy:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Multi-session load generator for streamlit_app.py over the Streamlit websocket protocol.
+
+Launches `streamlit run streamlit_app.py` against the in-process stub backend
+(or targets an already running app), then opens N simulated browser sessions
+that each loop through a chat turn, a slot click, a confirmation and a quick
+action. For every concurrency level it reports p50/p95/p99 interaction
+latency, errors, and the app process's thread count and RSS. Usage:
+
+    python tools/load_test.py --sessions 1 5 10 25 50 --duration 30 --latency lognormal:-0.5,0.4
+
+Interaction latency is the time from sending the rerun request until the
+reply is on screen, i.e. what a user waits for the page to settle. Background
+replies finish after the first script run, so a session keeps going like a
+browser would: clicks inside a fragment rerun only that fragment, and the
+fragments' `run_every` timers are fired until the "Connecting..." placeholder
+is gone. Uses tornado, which Streamlit already depends on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+
+TOOLS_DIR = Path(__file__).resolve().parent
+APP_PATH = TOOLS_DIR.parent / "streamlit_app.py"
+sys.path.insert(0, str(TOOLS_DIR))
+
+from stub_backend import StubBackend, StubConfig  # noqa: E402
+
+QUICK_ACTION_LABEL = "📅 Check Today's Availability"
+PENDING_REPLY_TEXT = "Connecting to AI Calendar Assistant"
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def widget_user_key(widget_id: str) -> Optional[str]:
+    """User key embedded in a widget id ("$$WIDGET_ID-<hash>-<key>")"""
+    parts = widget_id.split("-", 2)
+    if len(parts) == 3 and parts[2] != "None":
+        return parts[2]
+    return None
+
+
+class SimulatedSession:
+    """One browser tab: a websocket, the widgets it last saw, and its latencies"""
+
+    def __init__(self, app_url: str, timeout: float):
+        self.app_url = app_url
+        self.timeout = timeout
+        self.connection = None
+        self.chat_input_id = None
+        self.buttons = {}  # label or user key -> widget id
+        self.widget_fragments = {}  # widget id -> id of the fragment it was drawn in
+        self.auto_reruns = {}  # fragment id -> run_every seconds, as a browser would schedule them
+        self.reply_pending = False
+        self.latencies = []
+        self.errors = 0
+
+    async def connect(self):
+        ws_url = self.app_url.replace("http", "ws", 1) + "/_stcore/stream"
+        request = HTTPRequest(ws_url, headers={"Origin": self.app_url})
+        self.connection = await websocket_connect(request)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    async def rerun(self, widget_state: Optional[WidgetState] = None):
+        """Send a rerun request and wait until no reply is pending"""
+        fragment_id = self.widget_fragments.get(widget_state.id, "") if widget_state is not None else ""
+        start = time.perf_counter()
+        await self.run_script(widget_state, fragment_id)
+        deadline = start + self.timeout
+        while self.reply_pending:
+            if not self.auto_reruns or time.perf_counter() > deadline:
+                raise TimeoutError("Reply still pending")
+            await asyncio.sleep(min(self.auto_reruns.values()))
+            for timer_fragment_id in list(self.auto_reruns):
+                await self.run_script(None, timer_fragment_id)
+                if not self.reply_pending:
+                    break
+        return time.perf_counter() - start
+
+    async def run_script(self, widget_state: Optional[WidgetState], fragment_id: str):
+        """Send one rerun request, of the whole page or one fragment, and wait for it to finish"""
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ""
+        back_msg.rerun_script.page_script_hash = ""
+        back_msg.rerun_script.fragment_id = fragment_id
+        if widget_state is not None:
+            back_msg.rerun_script.widget_states.widgets.add().CopyFrom(widget_state)
+        if not fragment_id:
+            # A full run redraws every widget and re-registers every fragment timer
+            self.buttons = {}
+            self.auto_reruns = {}
+
+        await self.connection.write_message(back_msg.SerializeToString(), binary=True)
+        saw_placeholder = saw_messages = False
+        while True:
+            data = await asyncio.wait_for(self.connection.read_message(), self.timeout)
+            if data is None:
+                raise ConnectionError("Websocket closed by the server")
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                placeholder, message = self.collect_delta(msg)
+                saw_placeholder = saw_placeholder or placeholder
+                saw_messages = saw_messages or message
+            elif kind == "auto_rerun":
+                self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "script_finished":
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    # The app reran itself (e.g. the live tail polling); judge the run that follows
+                    saw_placeholder = saw_messages = False
+                    continue
+                if msg.script_finished not in (ForwardMsg.FINISHED_SUCCESSFULLY,
+                                               ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY):
+                    raise RuntimeError(f"Script finished with status {msg.script_finished}")
+                # A timer run of the reply watcher draws no messages and says nothing about the reply
+                if saw_placeholder or saw_messages:
+                    self.reply_pending = saw_placeholder
+                return
+
+    def collect_delta(self, msg: ForwardMsg) -> Tuple[bool, bool]:
+        """Remember the widgets a delta draws; returns (is the pending-reply placeholder, is a chat message)"""
+        delta = msg.delta
+        kind = delta.WhichOneof("type")
+        if kind == "add_block":
+            return False, delta.add_block.WhichOneof("type") == "chat_message"
+        if kind != "new_element":
+            return False, False
+        element = delta.new_element
+        element_type = element.WhichOneof("type")
+        if element_type == "markdown":
+            return PENDING_REPLY_TEXT in element.markdown.body, False
+        if element_type == "chat_input":
+            self.chat_input_id = element.chat_input.id
+        elif element_type == "button":
+            button = element.button
+            self.buttons[button.label] = button.id
+            self.widget_fragments[button.id] = delta.fragment_id
+            key = widget_user_key(button.id)
+            if key:
+                self.buttons[key] = button.id
+        return False, False
+
+    def latest_button(self, prefix: str) -> Optional[str]:
+        keys = [key for key in self.buttons if key.startswith(prefix)]
+        if not keys:
+            return None
+        return self.buttons[max(keys, key=lambda key: int(key[len(prefix):].split("_")[0]))]
+
+    async def interact(self, widget_state: Optional[WidgetState]):
+        try:
+            self.latencies.append(await self.rerun(widget_state))
+        except Exception:
+            self.errors += 1
+
+    async def run(self, deadline: float, think_time: float):
+        await self.connect()
+        await self.interact(None)
+        while time.time() < deadline:
+            acted = False
+            for step in (self.chat_turn, self.slot_click, self.confirm_click, self.quick_action):
+                state = step()
+                if state is None or time.time() >= deadline:
+                    continue
+                await self.interact(state)
+                acted = True
+                await asyncio.sleep(think_time)
+            if not acted:
+                # Nothing clickable (e.g. after an error): refresh the page
+                await self.interact(None)
+                await asyncio.sleep(think_time)
+
+    def trigger(self, widget_id: Optional[str]) -> Optional[WidgetState]:
+        if widget_id is None:
+            return None
+        state = WidgetState()
+        state.id = widget_id
+        state.trigger_value = True
+        return state
+
+    def chat_turn(self) -> Optional[WidgetState]:
+        if self.chat_input_id is None:
+            return None
+        state = WidgetState()
+        state.id = self.chat_input_id
+        state.string_trigger_value.data = "Book a meeting tomorrow"
+        return state
+
+    def slot_click(self) -> Optional[WidgetState]:
+        return self.trigger(self.latest_button("slot_"))
+
+    def confirm_click(self) -> Optional[WidgetState]:
+        return self.trigger(self.latest_button("confirm_yes_"))
+
+    def quick_action(self) -> Optional[WidgetState]:
+        return self.trigger(self.buttons.get(QUICK_ACTION_LABEL))
+
+
+def read_process_stats(pid: int) -> Dict:
+    """Thread count and RSS (kB) of a Linux process from /proc"""
+    stats = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("Threads:"):
+                stats["threads"] = int(line.split()[1])
+            elif line.startswith("VmRSS:"):
+                stats["rss_kb"] = int(line.split()[1])
+    return stats
+
+
+async def sample_process(pid: Optional[int], samples: List[Dict], stop: asyncio.Event):
+    while pid is not None and not stop.is_set():
+        try:
+            samples.append(read_process_stats(pid))
+        except OSError:
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(app_url: str, pid: Optional[int], sessions: int, duration: float,
+                    think_time: float, timeout: float) -> Dict:
+    simulated = [SimulatedSession(app_url, timeout) for _ in range(sessions)]
+    process_samples, stop = [], asyncio.Event()
+    sampler = asyncio.ensure_future(sample_process(pid, process_samples, stop))
+    deadline = time.time() + duration
+    results = await asyncio.gather(*(session.run(deadline, think_time) for session in simulated),
+                                   return_exceptions=True)
+    stop.set()
+    await sampler
+    for session in simulated:
+        session.close()
+
+    latencies = [latency * 1000 for session in simulated for latency in session.latencies]
+    return {
+        "sessions": sessions,
+        "interactions": len(latencies),
+        "errors": sum(session.errors for session in simulated) + sum(isinstance(r, Exception) for r in results),
+        "throughput_per_s": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": statistics.mean(latencies) if latencies else None,
+        "max_threads": max((sample["threads"] for sample in process_samples), default=None),
+        "max_rss_kb": max((sample["rss_kb"] for sample in process_samples), default=None),
+    }
+
+
+def wait_for_app(app_url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{app_url}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Streamlit app at {app_url} did not become healthy")
+
+
+def start_app(port: int, backend_url: str) -> subprocess.Popen:
+    env = dict(os.environ, BACKEND_URL=backend_url)
+    command = [
+        sys.executable, "-m", "streamlit", "run", str(APP_PATH),
+        "--server.headless", "true",
+        "--server.port", str(port),
+        "--server.enableCORS", "false",
+        "--server.enableXsrfProtection", "false",
+        "--browser.gatherUsageStats", "false",
+        # Always send full messages so the client never has to fetch cached ones
+        "--global.minCachedMessageSize", str(10 ** 12),
+    ]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--think-time", type=float, default=0.5, help="seconds between a session's interactions")
+    parser.add_argument("--latency", default="lognormal:-0.5,0.4", help="stub /chat latency distribution")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--app-url", help="load an already running app instead of starting one")
+    parser.add_argument("--pid", type=int, help="process to sample when using --app-url")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for one interaction")
+    parser.add_argument("--output", help="write JSON here as well as printing a table")
+    args = parser.parse_args(argv)
+
+    stub = None
+    app_process = None
+    if args.app_url:
+        app_url, pid = args.app_url.rstrip("/"), args.pid
+    else:
+        stub = StubBackend(StubConfig(latency=args.latency, token_delay=0))
+        app_process = start_app(args.port, stub.start())
+        app_url, pid = f"http://127.0.0.1:{args.port}", app_process.pid
+
+    try:
+        wait_for_app(app_url, 60)
+        levels = []
+        print(f"{'sessions':>8} {'req':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'threads':>8} {'rss MB':>8}")
+        for sessions in args.sessions:
+            level = asyncio.run(run_level(app_url, pid, sessions, args.duration, args.think_time, args.timeout))
+            levels.append(level)
+            fmt = lambda value: f"{value:.0f}" if value is not None else "-"  # noqa: E731
+            rss = level["max_rss_kb"] / 1024 if level["max_rss_kb"] else None
+            print(f"{sessions:>8} {level['interactions']:>6} {level['errors']:>5} {fmt(level['p50_ms']):>9} "
+                  f"{fmt(level['p95_ms']):>9} {fmt(level['p99_ms']):>9} {fmt(level['max_threads']):>8} {fmt(rss):>8}")
+        if args.output:
+            Path(args.output).write_text(json.dumps({"app_url": app_url, "latency": args.latency, "levels": levels}, indent=2))
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait(timeout=10)
+        if stub is not None:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
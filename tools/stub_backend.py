@@ -0,0 +1,338 @@
+"""Local stand-in for the calendar backend's /chat, /availability and /health endpoints.
+
+Speaks the same contracts as the FastAPI service so streamlit_app.py can run
+offline, with scriptable latency, cold starts, error injection and an SSE
+/chat/stream variant. Usage:
+
+    python tools/stub_backend.py --port 8000 --latency lognormal:-1,0.5 --cold-start 20
+    BACKEND_URL=http://127.0.0.1:8000 streamlit run streamlit_app.py
+
+It can also run in-process for benchmarks:
+
+    with StubBackend(StubConfig(latency="fixed:0.05")) as backend_url:
+        ...
+
+Control endpoints:
+    POST /__stub/sleep    start a new cold-start window (body: {"seconds": 30})
+    POST /__stub/config   update any StubConfig field (body: JSON object)
+    GET  /__stub/stats    request counts per endpoint
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class StubConfig:
+    latency: str = "fixed:0.2"  # /chat reply time, see sample_latency()
+    health_latency: str = "fixed:0.01"
+    cold_start: float = 0.0  # seconds after start (or /__stub/sleep) the backend is "booting"
+    cold_start_mode: str = "hang"  # "hang" holds requests until warm like Render, "503" rejects them
+    error_rate: float = 0.0  # fraction of /chat calls answered with error_status
+    error_status: int = 500
+    drop_rate: float = 0.0  # fraction of /chat calls whose connection is closed without a reply
+    stream: bool = True  # serve /chat/stream
+    availability: bool = True  # serve GET /availability
+    token_delay: float = 0.02  # seconds between streamed tokens
+    seed: Optional[int] = None
+
+
+def sample_latency(spec: str, rng: random.Random) -> float:
+    """Sample seconds from "fixed:s", "uniform:a,b", "normal:mean,sd", "lognormal:mu,sigma" or "exp:mean"""
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return rng.lognormvariate(values[0], values[1])
+    if kind == "exp":
+        return rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def make_slots(now: datetime) -> List[str]:
+    tomorrow = now + timedelta(days=1)
+    return [f"{tomorrow.strftime('%A, %B %d')} at {hour}" for hour in ("10:00 AM", "02:00 PM", "04:30 PM")]
+
+
+def make_free_slots(start: datetime, end: datetime, duration: int) -> List[str]:
+    """Three free slots per day in [start, end], labelled with the meeting length"""
+    slots = []
+    day = start
+    while day <= end:
+        slots.extend(f"{day.strftime('%A, %B %d')} at {hour} ({duration} min)"
+                     for hour in ("09:30 AM", "01:00 PM", "03:30 PM"))
+        day += timedelta(days=1)
+    return slots
+
+
+class StubState:
+    """Config, cold-start window, per-session conversations and request counts"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.warm_at = time.time() + config.cold_start
+        self.sessions = {}  # session_id -> {"offered": [...], "selected": slot}
+        self.replies = {}  # Idempotency-Key -> reply already sent
+        self.stats = {}
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def sleep(self, seconds: float):
+        self.warm_at = time.time() + seconds
+
+    def reply(self, session_id: str, text: str, idempotency_key: Optional[str] = None) -> Dict:
+        """Scripted conversation: ask -> slots -> confirm -> booking; repeated keys get the first reply"""
+        if idempotency_key:
+            with self.lock:
+                if idempotency_key in self.replies:
+                    self.stats["idempotent_replays"] = self.stats.get("idempotent_replays", 0) + 1
+                    return self.replies[idempotency_key]
+        response = self.scripted_reply(session_id, text)
+        if idempotency_key:
+            with self.lock:
+                self.replies[idempotency_key] = response
+        return response
+
+    def scripted_reply(self, session_id: str, text: str) -> Dict:
+        with self.lock:
+            session = self.sessions.setdefault(session_id, {"offered": [], "selected": None})
+        lowered = text.strip().lower()
+        response = {"message": "", "booking_data": None, "suggested_times": [], "requires_confirmation": False}
+
+        if session["selected"] and lowered.startswith("yes"):
+            slot, session["selected"] = session["selected"], None
+            response["message"] = f"Great, I've booked your meeting for {slot}."
+            response["booking_data"] = {
+                "id": uuid.uuid4().hex[:12],
+                "title": "Meeting",
+                "start_time": datetime.now().replace(microsecond=0).isoformat(),
+                "status": "confirmed",
+                "html_link": "",
+            }
+        elif session["selected"] and lowered.startswith("no"):
+            session["selected"] = None
+            response["message"] = "No problem, I've cancelled that. Anything else?"
+        elif text in session["offered"] or (lowered.startswith("please book ") and text[12:] in session["offered"]):
+            text = text[12:] if lowered.startswith("please book ") else text
+            session["selected"] = text
+            response["message"] = f"Shall I book a meeting for {text}?"
+            response["requires_confirmation"] = True
+        elif any(word in lowered for word in ("availab", "schedule", "book", "meeting", "call", "free")):
+            session["offered"] = make_slots(datetime.now())
+            response["message"] = "Here are some times that work:"
+            response["suggested_times"] = session["offered"]
+        else:
+            response["message"] = f"You said: {text}. I can check availability or book a meeting."
+        return response
+
+    def availability(self, session_id: str, start: datetime, end: datetime, duration: int) -> List[str]:
+        """Free slots; remembered so a "Please book <slot>" reply can confirm them"""
+        slots = make_free_slots(start, end, duration)
+        with self.lock:
+            session = self.sessions.setdefault(session_id, {"offered": [], "selected": None})
+            session["offered"] = slots
+        return slots
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: Dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def wait_until_warm(self) -> bool:
+        """Apply the cold-start window; False means the request was already answered"""
+        remaining = self.state.warm_at - time.time()
+        if remaining <= 0:
+            return True
+        if self.state.config.cold_start_mode == "503":
+            self.send_json(503, {"detail": "Service is starting"})
+            return False
+        time.sleep(remaining)
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.state.count(f"GET {url.path}")
+        if url.path == "/health":
+            if not self.wait_until_warm():
+                return
+            time.sleep(sample_latency(self.state.config.health_latency, self.state.rng))
+            self.send_json(200, {
+                "status": "healthy",
+                "calendar_status": "mock",
+                "server_time": datetime.now().isoformat(),
+            })
+        elif url.path == "/availability" and self.state.config.availability:
+            if not self.wait_until_warm():
+                return
+            query = parse_qs(url.query)
+            try:
+                start = datetime.fromisoformat(query["start"][0])
+                end = datetime.fromisoformat(query.get("end", query["start"])[0])
+                duration = int(query.get("duration", ["30"])[0])
+            except (KeyError, ValueError):
+                self.send_json(422, {"detail": "start, end and duration are required"})
+                return
+            session_id = query.get("session_id", ["default"])[0]
+            self.send_json(200, {"slots": self.state.availability(session_id, start, end, duration)})
+        elif url.path == "/__stub/stats":
+            self.send_json(200, {"stats": self.state.stats, "config": asdict(self.state.config)})
+        else:
+            self.send_json(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self.state.count(f"POST {url.path}")
+        if url.path == "/__stub/sleep":
+            self.state.sleep(float(self.read_json().get("seconds", self.state.config.cold_start)))
+            self.send_json(200, {"warm_at": self.state.warm_at})
+            return
+        if url.path == "/__stub/config":
+            updates = self.read_json()
+            names = {field.name for field in fields(StubConfig)}
+            for name, value in updates.items():
+                if name in names:
+                    setattr(self.state.config, name, value)
+            self.send_json(200, asdict(self.state.config))
+            return
+        if url.path not in ("/chat", "/chat/stream") or (url.path == "/chat/stream" and not self.state.config.stream):
+            self.send_json(404, {"detail": "Not Found"})
+            return
+
+        body = self.read_json()
+        if not self.wait_until_warm():
+            return
+        config, rng = self.state.config, self.state.rng
+        if rng.random() < config.drop_rate:
+            self.close_connection = True
+            self.connection.close()
+            return
+        if rng.random() < config.error_rate:
+            self.send_json(config.error_status, {"detail": "Injected error"})
+            return
+
+        session_id = parse_qs(url.query).get("session_id", ["default"])[0]
+        time.sleep(sample_latency(config.latency, rng))
+        response = self.state.reply(session_id, body.get("content", ""), self.headers.get("Idempotency-Key"))
+        if url.path == "/chat":
+            self.send_json(200, response)
+        else:
+            self.send_stream(response)
+
+    def write_chunk(self, data: bytes):
+        """One Transfer-Encoding: chunked frame; empty data ends the body"""
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_stream(self, response: Dict):
+        """Send the reply as chunked SSE tokens followed by the structured final frame, like StreamingResponse"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = response["message"].split(" ")
+        for index, word in enumerate(words):
+            token = word if index == len(words) - 1 else word + " "
+            self.write_chunk(f"data: {json.dumps({'type': 'token', 'content': token})}\n\n".encode())
+            time.sleep(self.state.config.token_delay)
+        final = {"type": "final", **{key: value for key, value in response.items() if key != "message"}}
+        self.write_chunk(f"event: final\ndata: {json.dumps(final)}\n\n".encode())
+        self.write_chunk(b"")
+
+
+class StubBackend:
+    """Run the stub server on a background thread"""
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.state = StubState(config or StubConfig())
+        handler = type("BoundStubHandler", (StubHandler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-backend", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self.state.warm_at = time.time() + self.state.config.cold_start
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    defaults = StubConfig()
+    parser.add_argument("--latency", default=defaults.latency)
+    parser.add_argument("--health-latency", default=defaults.health_latency)
+    parser.add_argument("--cold-start", type=float, default=defaults.cold_start)
+    parser.add_argument("--cold-start-mode", choices=["hang", "503"], default=defaults.cold_start_mode)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--drop-rate", type=float, default=defaults.drop_rate)
+    parser.add_argument("--no-stream", dest="stream", action="store_false")
+    parser.add_argument("--no-availability", dest="availability", action="store_false")
+    parser.add_argument("--token-delay", type=float, default=defaults.token_delay)
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = StubConfig(**{field.name: getattr(args, field.name) for field in fields(StubConfig)})
+    backend = StubBackend(config, args.host, args.port)
+    print(f"Stub backend listening on {backend.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        backend.stop()
+
+
+if __name__ == "__main__":
+    main()